@@ -1,65 +1,107 @@
-from flask import Flask, request, jsonify, render_template, session
-from openai import OpenAI
+from flask import Flask, Response, got_request_exception, request, jsonify, render_template, session
 import os
 from dotenv import load_dotenv
 
-import math
-import re
+import hashlib
+import json
+import time
 
 from datetime import timedelta
 import uuid
 
-# Inventory of Clink
-import csv
-def load_inventory():
-    inventory = []
-    with open("inventory.csv", "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            row["price_clink"] = float(row["price_clink"])
-            row["price_home_depot"] = float(row["price_home_depot"]) if row["price_home_depot"] else None
-            row["available"] = int(row["available"])
-            row["length_in"] = float(row["length_in"]) if row["length_in"] else None
-            row["width_in"] = float(row["width_in"]) if row["width_in"] else None
-            row["height_in"] = float(row["height_in"]) if row["height_in"] else None
-            inventory.append(row)
-    return inventory
+import openai
 
+# Inventory of Clink
+import metrics
+from cache import LRUCache
+from compaction import HistoryCompactor
+from intent import parse_order
+from inventory import InventoryCatalog, normalize_name
+from quote import CLOSE_MATCH_DISTANCE, MAX_QUOTE_LINES, quote_lines, recommended_quantity
+from retrieval import InventoryRetriever
+from streaming import COST_TAG, CostTagFilter, sse_event
 
-inventory_data = load_inventory()
+catalog = InventoryCatalog(os.getenv("INVENTORY_PATH", "inventory.csv"))
 
 
 # calculate the cost function
 def calculate_cost(name, quantity):
-    for item in inventory_data:
-        if item["name"].lower() == name.lower():
-            if quantity > item["available"]:
-                return None
-
-            clink_price = item["price_clink"] * quantity
-            retail_price = item["price_home_depot"] * quantity if item["price_home_depot"] else None
-            savings = retail_price - clink_price if retail_price else None
-
-            rec_quantity = int(math.ceil(quantity * 1.1 / 5.0) * 5)
-            rec_clink_price = item["price_clink"] * rec_quantity
-            rec_home_price = item["price_home_depot"] * rec_quantity if item["price_home_depot"] else None
-            rec_savings = rec_home_price - rec_clink_price if rec_home_price else None
-
-            return {
-                "Material Name": name,
-                "Requested Quantity": quantity,
-                "Clink Price": round(clink_price, 2),
-                "Retail Price": round(retail_price, 2) if retail_price else "N/A",
-                "Savings": round(savings, 2) if savings else "N/A",
-
-                "Recommended Quantity": rec_quantity,
-                "Recommended Price Clink": round(rec_clink_price, 2),
-                "Recommended Price Home Depot": round(rec_home_price, 2) if rec_home_price else "N/A",
-                "Recommended Savings": round(rec_savings, 2) if rec_savings else "N/A"
-            }
-    return None
-    
-
+    item = catalog.find(name)
+    if not item:
+        return None
+
+    if quantity > item["available"]:
+        return None
+
+    clink_price = item["price_clink"] * quantity
+    retail_price = item["price_home_depot"] * quantity if item["price_home_depot"] else None
+    savings = retail_price - clink_price if retail_price else None
+
+    rec_quantity = recommended_quantity(quantity)
+    rec_clink_price = item["price_clink"] * rec_quantity
+    rec_home_price = item["price_home_depot"] * rec_quantity if item["price_home_depot"] else None
+    rec_savings = rec_home_price - rec_clink_price if rec_home_price else None
+
+    return {
+        "Material Name": item["name"],
+        "Requested Quantity": quantity,
+        "Clink Price": round(clink_price, 2),
+        "Retail Price": round(retail_price, 2) if retail_price else "N/A",
+        "Savings": round(savings, 2) if savings else "N/A",
+
+        "Recommended Quantity": rec_quantity,
+        "Recommended Price Clink": round(rec_clink_price, 2),
+        "Recommended Price Home Depot": round(rec_home_price, 2) if rec_home_price else "N/A",
+        "Recommended Savings": round(rec_savings, 2) if rec_savings else "N/A"
+    }
+
+
+# Turn a calculate_cost tag into the message shown to the customer.
+# Returns None if the material isn't in our inventory at all.
+def cost_reply(name, quantity):
+    result = calculate_cost(name, quantity)
+
+    if result:
+        return (
+            f"You will need {result['Requested Quantity']} {result['Material Name']} for your project.\n"
+            f"Clink charges ${result['Clink Price']} compared to ${result['Retail Price']} at Home Depot. "
+            f"You're saving ${result['Savings']} with Clink!\n\n"
+            f"To be safe, we recommend ordering {result['Recommended Quantity']} "
+            f"in case of breakage or cuts.\n"
+            f"Total cost would be ${result['Recommended Price Clink']} with Clink vs "
+            f"${result['Recommended Price Home Depot']} at Home Depot — "
+            f"saving you ${result['Recommended Savings']}."
+        )
+
+    # Not enough inventory — suggest partial stock or fallback
+    item = catalog.find(name)
+    if not item:
+        return None
+    metrics.event("out_of_stock")
+
+    # Offer the closest in-stock match from the same category first, if it
+    # really is close
+    line = quote_lines([{"name": item["name"], "quantity": quantity}], catalog, alternatives_limit=1)["lines"][0]
+    if line.get("Alternatives") and line["Alternatives"][0]["Distance"] <= CLOSE_MATCH_DISTANCE:
+        alternative = line["Alternatives"][0]
+        return (
+            f"We don’t have enough {item['name']} for {quantity} units, but {alternative['Material Name']} "
+            f"is a close match and we have {alternative['Available']} in stock.\n"
+            f"{quantity} of them would cost ${alternative['Clink Price']} with Clink. Want me to price that out?"
+        )
+
+    partial_qty = item["available"]
+    if partial_qty == 0:
+        return (
+            f"Unfortunately, we don’t have any {item['name']} in stock right now. "
+            f"You’ll have to look elsewhere."
+        )
+    partial_price = round(item["price_clink"] * partial_qty, 2)
+    return (
+        f"We don’t have enough {item['name']} to fulfill your full request, "
+        f"but we do have {partial_qty} in stock.\n"
+        f"You can still get them from Clink for ${partial_price} — and save some compared to retail."
+    )
 
 
 
@@ -70,10 +112,50 @@ app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "super-secret-key")
 app.permanent_session_lifetime = timedelta(days=1)
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-
-SYSTEM_PROMPT = f"""
+# Request-phase timings, token/cost accounting and counters, exposed at
+# /metrics when METRICS_ENABLED is set (see metrics.py)
+metrics.registry.enabled = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+if os.getenv("REQUEST_LOG", "").lower() in ("1", "true", "yes"):
+    metrics.enable_request_log()
+app.session_interface = metrics.TimedSessionInterface()
+app.wsgi_app = metrics.MetricsMiddleware(app.wsgi_app)
+
+# USD per 1M tokens, for the cost estimate
+LLM_INPUT_PRICE = float(os.getenv("LLM_INPUT_PRICE", 0.10))
+LLM_OUTPUT_PRICE = float(os.getenv("LLM_OUTPUT_PRICE", 0.40))
+
+# One pooled client shared by every request, with deadlines, retries
+# and a cap on in-flight completions (see llm.py). Each model call holds a
+# request thread, so the cap has to sit below the number of threads the
+# server runs per process (WEB_THREADS, e.g. gunicorn --threads) for
+# excess chats to get a fast 503 instead of queueing in the server.
+from llm import LLMGateway, LLMTimeout, Overloaded
+
+WEB_THREADS = int(os.getenv("WEB_THREADS", 32))
+
+llm = LLMGateway(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=os.getenv("OPENAI_BASE_URL"),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", max(1, WEB_THREADS - 4))),
+    timeout=float(os.getenv("LLM_TIMEOUT", 30)),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", 2)),
+    pool_size=int(os.getenv("LLM_POOL_SIZE", 100)),
+)
+
+# Conversation history lives server-side, keyed by session["session_id"],
+# so the cookie stays the same small size however long the chat gets
+from history_store import make_history_store
+
+history_store = make_history_store(
+    os.getenv("HISTORY_BACKEND", "sqlite"),
+    ttl=app.permanent_session_lifetime.total_seconds(),
+)
+
+
+# The static part of the system prompt. It is identical on every turn so the
+# provider can cache it; the inventory section is picked per turn (see
+# build_messages).
+SYSTEM_PROMPT = """
 You are ClinkBot, a helpful, efficient assistant built to help customers estimate and purchase construction materials from Clink.
 
 Your job:
@@ -87,17 +169,6 @@ Your job:
 
 ---
 
-Clink’s Current Inventory:
-{[
-  f"{item['name']} ({item['category']}, {item['color']}, {item['color_id']}, {item['num_holes']}): "
-  f"Clink = ${item['price_clink']}, "
-  f"Home Depot = ${item['price_home_depot']}, "
-  f"{item['available']} available"
-  for item in inventory_data
-]}
-
----
-
 ❗ Guidelines:
 
 - **Don’t assume the material** is brick just because Clink sells it. First ask what they’re building (e.g., wall, bench, patio).
@@ -156,6 +227,103 @@ Tone:
 - Always sound confident and helpful.
 """
 
+# Changes whenever the static prompt changes; cache keys also include the
+# inventory version, so cached completions never outlive their prompt
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:12]
+
+retriever = InventoryRetriever(catalog, token_budget=int(os.getenv("INVENTORY_PROMPT_TOKENS", 600)))
+
+
+# Older turns are folded into a rolling summary so the prompt stays bounded
+# however long the conversation runs (see compaction.py)
+compactor = HistoryCompactor(
+    history_store, catalog,
+    keep_turns=int(os.getenv("HISTORY_KEEP_TURNS", 6)),
+    token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", 1500)),
+)
+
+
+def build_messages(session_id, history):
+    recent, tokens_saved = compactor.compact(session_id, history)
+    if tokens_saved:
+        app.logger.debug("Compacted history for %s, saved ~%s tokens", session_id, tokens_saved)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": retriever.inventory_section(recent)},
+    ] + recent
+
+
+# Replies we can give without the model
+completion_cache = LRUCache(
+    maxsize=int(os.getenv("COMPLETION_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("COMPLETION_CACHE_TTL", 3600)),
+)
+# Only conversations this short are cached: openers like "hi" or "what do
+# you sell?" repeat across customers, later turns rarely do
+COMPLETION_CACHE_MAX_MESSAGES = 3
+
+
+def completion_cache_key(history):
+    if len(history) > COMPLETION_CACHE_MAX_MESSAGES:
+        return None
+    recent = [(message["role"], normalize_name(message["content"])) for message in history]
+    return hashlib.sha256(json.dumps([PROMPT_VERSION, catalog.version, recent]).encode()).hexdigest()
+
+
+# Returns (reply, cache_key). The reply is in the model's format (cost tags
+# unresolved) or None if the model has to answer; cache_key is where to
+# store the model's reply, if it is cacheable.
+def local_reply(history):
+    # Explicit orders ("I want 80 white clay bricks") are priced directly
+    order = parse_order(history[-1]["content"], catalog)
+    if order:
+        item, quantity = order
+        metrics.event("fast_path")
+        return f"[calculate_cost(name=\"{item['name']}\", quantity={quantity})]", None
+
+    cache_key = completion_cache_key(history)
+    if cache_key is None:
+        return None, None
+    reply = completion_cache.get(cache_key)
+    metrics.event("cache_hit" if reply is not None else "cache_miss")
+    return reply, cache_key
+
+
+
+metrics.registry.reading("clink_completion_cache_entries", "Completions held in the cache",
+                         lambda: len(completion_cache))
+metrics.registry.reading("clink_history_tokens_saved_total", "Estimated prompt tokens saved by history compaction",
+                         lambda: compactor.stats.tokens_saved, type="counter")
+metrics.registry.reading("clink_history_compacted_requests_total", "Requests whose history was compacted",
+                         lambda: compactor.stats.compacted_requests, type="counter")
+metrics.registry.reading("clink_inventory_items", "Rows in the current inventory", lambda: len(catalog))
+metrics.registry.reading("clink_inventory_version", "Inventory reload count (starts at 1)", lambda: catalog.version)
+
+
+def record_error(sender, exception, **extra):
+    metrics.error(exception)
+
+got_request_exception.connect(record_error, app)
+
+
+@app.errorhandler(Overloaded)
+def handle_overloaded(e):
+    metrics.event("overloaded")
+    return jsonify({"error": "ClinkBot is busy right now, please try again in a moment."}), 503, {"Retry-After": "1"}
+
+@app.errorhandler(LLMTimeout)
+def handle_llm_timeout(e):
+    metrics.event("llm_timeout")
+    return jsonify({"error": "ClinkBot took too long to answer, please try again."}), 504
+
+# Whatever the model API still fails with once retries are used up
+@app.errorhandler(openai.OpenAIError)
+def handle_llm_error(e):
+    metrics.error(e)
+    status = getattr(e, "status_code", None)
+    if status is not None and (status == 429 or status >= 500):
+        return jsonify({"error": "ClinkBot is unavailable right now, please try again in a moment."}), 503
+    return jsonify({"error": "ClinkBot couldn't get an answer, please try again."}), 502
 
 
 @app.route("/")
@@ -164,12 +332,15 @@ def home():
 
 @app.before_request
 def ensure_session():
+    record = metrics.current_request()
+    if record is not None:
+        record.endpoint = request.endpoint or "unmatched"
+
     if "session_id" not in session:
         session["session_id"] = str(uuid.uuid4())
-    if "history" not in session:
-        session["history"] = []
-
-convo_history = []
+    # Drop transcripts left in cookies from before history moved server-side
+    if "history" in session:
+        session.pop("history")
 
 @app.route("/chat", methods=["POST"])
 def chat():
@@ -177,72 +348,178 @@ def chat():
     if not user_input:
         return jsonify({"error": "No input provided"}), 400
     
-    history = session["history"]
+    with metrics.span("history_load"):
+        history = history_store.load(session["session_id"])
     history.append({"role": "user", "content": user_input})
 
-    full_message = [{"role": "system", "content": SYSTEM_PROMPT}] + history
-
-    response = client.chat.completions.create(
-        model="gpt-4.1-nano",
-        messages=full_message,
-        temperature=0.7
-    )
+    with metrics.span("local_reply"):
+        reply, cache_key = local_reply(history)
+    if reply is None:
+        with metrics.span("prompt_assembly"):
+            full_message = build_messages(session["session_id"], history)
+
+        with metrics.span("llm_call"):
+            response = llm.complete(
+                model="gpt-4.1-nano",
+                messages=full_message,
+                temperature=0.7
+            )
+        metrics.record_usage(response.usage, LLM_INPUT_PRICE, LLM_OUTPUT_PRICE)
 
-    reply = response.choices[0].message.content
+        reply = response.choices[0].message.content
+        if cache_key:
+            completion_cache.set(cache_key, reply)
 
     # Check if GPT inserted a cost calculation tag
-    match = re.search(r"\[calculate_cost\(name=['\"](.+?)['\"],\s*quantity=(\d+)\)\]", reply)
+    with metrics.span("tag_parse"):
+        match = COST_TAG.search(reply)
     if match:
-        name = match.group(1)
-        quantity = int(match.group(2))
-        result = calculate_cost(name, quantity)
-
-        if result:
-            natural_reply = (
-                f"You will need {result['Requested Quantity']} {result['Material Name']} for your project.\n"
-                f"Clink charges ${result['Clink Price']} compared to ${result['Retail Price']} at Home Depot. "
-                f"You're saving ${result['Savings']} with Clink!\n\n"
-                f"To be safe, we recommend ordering {result['Recommended Quantity']} "
-                f"in case of breakage or cuts.\n"
-                f"Total cost would be ${result['Recommended Price Clink']} with Clink vs "
-                f"${result['Recommended Price Home Depot']} at Home Depot — "
-                f"saving you ${result['Recommended Savings']}."
-            )
-            history.append({"role": "assistant", "content": natural_reply})
-            session["history"] = history
-            return jsonify({"reply": natural_reply})
-
-        else:
-            # Not enough inventory — suggest partial stock or fallback
-            for item in inventory_data:
-                if item["name"].lower() == name.lower():
-                    partial_qty = item["available"]
-                    if partial_qty == 0:
-                        error_msg = (
-                            f"Unfortunately, we don’t have any {item['name']} in stock right now. "
-                            f"You’ll have to look elsewhere."
-                        )
-                    else:
-                        partial_price = round(item["price_clink"] * partial_qty, 2)
-                        error_msg = (
-                            f"We don’t have enough {item['name']} to fulfill your full request, "
-                            f"but we do have {partial_qty} in stock.\n"
-                            f"You can still get them from Clink for ${partial_price} — and save some compared to retail."
-                        )
-                    history.append({"role": "assistant", "content": error_msg})
-                    session["history"] = history
-                    return jsonify({"reply": error_msg})
-
-    # Normal Reply
+        metrics.event("tag_hit")
+        with metrics.span("calculate_cost"):
+            cost_message = cost_reply(match.group(1), int(match.group(2)))
+        if cost_message:
+            reply = cost_message
+
     history.append({"role": "assistant", "content": reply})
-    session["history"] = history
+    with metrics.span("history_save"):
+        history_store.append(session["session_id"], history[-2:])
     return jsonify({"reply": reply})
 
 
+# Streaming variant of /chat: the reply is sent as server-sent events while
+# the model generates it. Cost tags are held back as they arrive and replaced
+# by the pricing message once complete.
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    user_input = request.json.get("message", "")
+    if not user_input:
+        return jsonify({"error": "No input provided"}), 400
+
+    session_id = session["session_id"]
+    with metrics.span("history_load"):
+        history = history_store.load(session_id)
+    history.append({"role": "user", "content": user_input})
+
+    with metrics.span("local_reply"):
+        reply, cache_key = local_reply(history)
+    stream = None
+    if reply is None:
+        with metrics.span("prompt_assembly"):
+            full_message = build_messages(session_id, history)
+
+        opened = time.perf_counter()
+        stream = llm.stream(
+            model="gpt-4.1-nano",
+            messages=full_message,
+            temperature=0.7,
+            stream_options={"include_usage": True}
+        )
+
+    def texts():
+        if stream is None:
+            yield reply
+            return
+        first = True
+        for chunk in stream:
+            # With include_usage the last chunk has no choices, only usage
+            if chunk.usage:
+                metrics.record_usage(chunk.usage, LLM_INPUT_PRICE, LLM_OUTPUT_PRICE)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first:
+                    first = False
+                    metrics.FIRST_TOKEN_LATENCY.observe(time.perf_counter() - opened)
+                yield chunk.choices[0].delta.content
+        metrics.add_phase("llm_stream", time.perf_counter() - opened)
+
+    def generate():
+        raw = []
+        shown = []
+        tags = CostTagFilter()
+
+        def render(parts):
+            for part in parts:
+                if not isinstance(part, str):
+                    metrics.event("tag_hit")
+                    with metrics.span("calculate_cost"):
+                        part = cost_reply(part.group(1), int(part.group(2))) or part.group(0)
+                shown.append(part)
+                yield sse_event({"delta": part})
+
+        # Flush headers straight away so the browser can start listening
+        yield ": stream open\n\n"
+        parsing = 0.0
+        try:
+            for text in texts():
+                raw.append(text)
+                start = time.perf_counter()
+                parts = tags.feed(text)
+                parsing += time.perf_counter() - start
+                yield from render(parts)
+            yield from render(tags.flush())
+            metrics.add_phase("tag_parse", parsing)
+        except Exception as e:
+            metrics.error(e)
+            app.logger.exception("Streaming completion failed")
+            yield sse_event({"error": "Something went wrong, please try again."}, event="error")
+            return
+        finally:
+            if stream is not None:
+                stream.close()
+
+        if stream is not None and cache_key:
+            completion_cache.set(cache_key, "".join(raw))
+        history.append({"role": "assistant", "content": "".join(shown)})
+        with metrics.span("history_save"):
+            history_store.append(session_id, history[-2:])
+        yield sse_event({}, event="done")
+
+    response = Response(generate(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    if stream is not None:
+        # Frees the completion slot even if the client disconnects before
+        # the generator starts
+        response.call_on_close(stream.close)
+    return response
+
+
+
+# Price a whole bill of materials in one call:
+# {"items": [{"name": "White Clay Bricks", "quantity": 80}, ...]}
+@app.route("/quote", methods=["POST"])
+def quote():
+    items = (request.get_json(silent=True) or {}).get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "No items provided"}), 400
+    if len(items) > MAX_QUOTE_LINES:
+        return jsonify({"error": f"At most {MAX_QUOTE_LINES} items per quote"}), 400
+
+    lines = []
+    for entry in items:
+        try:
+            name = str(entry["name"])
+            quantity = entry["quantity"]
+        except (KeyError, TypeError):
+            return jsonify({"error": "Each item needs a name and a quantity"}), 400
+        # JSON booleans are ints in Python; 2.7 or "80" shouldn't be coerced either
+        if not isinstance(quantity, int) or isinstance(quantity, bool):
+            return jsonify({"error": f"Quantity for {name} must be a whole number"}), 400
+        if quantity <= 0:
+            return jsonify({"error": f"Quantity for {name} must be positive"}), 400
+        lines.append({"name": name, "quantity": quantity})
+
+    return jsonify(quote_lines(lines, catalog))
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not metrics.registry.enabled:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
 
 @app.route("/reset", methods=["POST"])
 def reset_chat():
-    session["history"] = []
+    history_store.clear(session["session_id"])
     return jsonify({"status": "Conversation reset."})
 
     
@@ -0,0 +1,59 @@
+"""Load time and lookup cost of InventoryCatalog versus the old linear scan.
+
+    python bench/bench_inventory.py [rows ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inventory import InventoryCatalog, load_inventory  # noqa: E402
+from synth_inventory import write_inventory  # noqa: E402
+
+
+def linear_find(items, name):
+    for item in items:
+        if item["name"].lower() == name.lower():
+            return item
+    return None
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(rows, lookups=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_inventory(os.path.join(tmp, "inventory.csv"), rows)
+
+        load_s = timed(lambda: load_inventory(path), 3)
+        catalog_s = timed(lambda: InventoryCatalog(path), 3)
+        catalog = InventoryCatalog(path, check_interval=3600)
+        items = catalog.items
+
+        rng = random.Random(1)
+        names = [rng.choice(items)["name"] for _ in range(lookups)]
+        # near misses the model tends to produce: case, punctuation, singular
+        fuzzy = [n.upper().replace("s ", " ", 1) + "." for n in names]
+
+        scan_n = min(lookups, 200)
+        scan_s = timed(lambda: [linear_find(items, n) for n in names[:scan_n]], 1) / scan_n
+        find_s = timed(lambda: [catalog.find(n) for n in names], 1) / lookups
+        fuzzy_s = timed(lambda: [catalog.find(n) for n in fuzzy], 1) / lookups
+        hits = sum(1 for n in fuzzy if catalog.find(n) is not None)
+
+        print(f"{rows:>7} rows | load {load_s * 1000:8.1f} ms | catalog build {catalog_s * 1000:8.1f} ms | "
+              f"linear scan {scan_s * 1e6:9.1f} us | find {find_s * 1e6:6.2f} us | "
+              f"fuzzy find {fuzzy_s * 1e6:6.2f} us ({hits}/{lookups} hits)")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 50000]
+    for size in sizes:
+        run(size)
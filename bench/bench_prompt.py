@@ -0,0 +1,56 @@
+"""Prompt size and selection time of per-turn inventory retrieval versus
+pasting the whole catalog into the system prompt.
+
+    python bench/bench_prompt.py [rows ...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inventory import InventoryCatalog  # noqa: E402
+from retrieval import InventoryRetriever, estimate_tokens, format_item  # noqa: E402
+from synth_inventory import write_inventory  # noqa: E402
+
+CONVERSATIONS = [
+    [{"role": "user", "content": "hi"}],
+    [{"role": "user", "content": "I'm building a garden wall, thinking red brick"}],
+    [{"role": "user", "content": "I need tile for a bathroom floor"},
+     {"role": "assistant", "content": "Great! Do you have a color in mind?"},
+     {"role": "user", "content": "something gray or white, matte"}],
+    [{"role": "user", "content": "cedar boards for a bench, about 40 of them"}],
+]
+
+
+def run(rows, budget=600, repeat=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_inventory(os.path.join(tmp, "inventory.csv"), rows)
+        catalog = InventoryCatalog(path, check_interval=3600)
+
+        full_prompt = str([format_item(item) for item in catalog.items])
+
+        start = time.perf_counter()
+        retriever = InventoryRetriever(catalog, token_budget=budget)
+        build_s = time.perf_counter() - start
+
+        sizes, timings = [], []
+        for conversation in CONVERSATIONS:
+            sizes.append(estimate_tokens(retriever.inventory_section(conversation)))
+            for _ in range(repeat):
+                start = time.perf_counter()
+                retriever.inventory_section(conversation)
+                timings.append(time.perf_counter() - start)
+
+        print(f"{rows:>7} rows | full catalog ~{estimate_tokens(full_prompt):>9} tokens | "
+              f"selected ~{max(sizes):>4} tokens | index build {build_s * 1000:8.1f} ms | "
+              f"select p50 {statistics.median(timings) * 1000:6.2f} ms, "
+              f"max {max(timings) * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 10000, 50000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,44 @@
+"""Batch quote cost for bills of materials of various sizes.
+
+    python bench/bench_quote.py [rows ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inventory import InventoryCatalog  # noqa: E402
+from quote import quote_lines  # noqa: E402
+from synth_inventory import write_inventory  # noqa: E402
+
+
+def run(rows, line_counts=(10, 100, 500)):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_inventory(os.path.join(tmp, "inventory.csv"), rows)
+        catalog = InventoryCatalog(path, check_interval=3600)
+        items = catalog.items
+        rng = random.Random(2)
+
+        start = time.perf_counter()
+        quote_lines([{"name": items[0]["name"], "quantity": 1}], catalog)
+        build_s = time.perf_counter() - start
+
+        results = []
+        for count in line_counts:
+            lines = [{"name": rng.choice(items)["name"], "quantity": rng.randint(1, 600)} for _ in range(count)]
+            start = time.perf_counter()
+            quote = quote_lines(lines, catalog)
+            elapsed = time.perf_counter() - start
+            short = count - quote["totals"]["Fillable Lines"]
+            results.append(f"{count} lines {elapsed * 1000:7.1f} ms ({short} short)")
+
+        print(f"{rows:>7} rows | columns build {build_s * 1000:7.1f} ms | " + " | ".join(results))
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 50000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,198 @@
+"""A local stand-in for the OpenAI chat completions API, for load tests.
+
+    python bench/fake_openai.py --port 8900 --latency 0.4 --tokens-per-sec 60 \
+        --tag-rate 0.3 --inventory inventory.csv
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1 (any
+OPENAI_API_KEY will do). Replies are filler text of --reply-tokens words,
+or lines taken in turn from a --script file; a --tag-rate share of them end
+with a calculate_cost tag for an item from --inventory. Both plain and
+streamed completions are served, including the usage chunk asked for with
+stream_options. --error-rate answers that share of requests with a 503 so
+the app's retries get exercised.
+"""
+import argparse
+import csv
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = ("Great choice for that project. These hold up well outdoors and the color stays put, "
+          "so you can lay them in a running bond and finish the joints however you like").split()
+
+
+class Script:
+    """Decides what each completion says and how long it takes."""
+
+    def __init__(self, latency=0.3, jitter=0.0, tokens_per_sec=0.0, reply_tokens=40, tag_rate=0.0,
+                 error_rate=0.0, names=(), replies=(), seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.reply_tokens = reply_tokens
+        self.tag_rate = tag_rate
+        self.error_rate = error_rate
+        self.names = list(names) or ["Red Clay Brick"]
+        self._replies = itertools.cycle(replies) if replies else None
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def fail(self):
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def reply(self, messages):
+        with self._lock:
+            if self._replies is not None:
+                return next(self._replies)
+            words = [FILLER[i % len(FILLER)] for i in range(self.reply_tokens)]
+            text = " ".join(words).capitalize() + "."
+            if self._rng.random() < self.tag_rate:
+                last = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+                number = re.search(r"\d+", last)
+                quantity = int(number.group()) if number else self._rng.randint(10, 200)
+                text += f' [calculate_cost(name="{self._rng.choice(self.names)}", quantity={quantity})]'
+            return text
+
+
+def _tokens(text):
+    # Split into word-ish pieces that keep their leading space, like real deltas
+    return re.findall(r"\s*\S+", text)
+
+
+def _prompt_tokens(messages):
+    return sum(len(str(m.get("content", ""))) // 4 + 4 for m in messages)
+
+
+def make_handler(script):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._json(200, {"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "bench"}]})
+            else:
+                self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            if script.fail():
+                self._json(503, {"error": {"message": "Scripted failure", "type": "server_error"}})
+                return
+
+            messages = body.get("messages", [])
+            model = body.get("model", "fake")
+            text = script.reply(messages)
+            tokens = _tokens(text)
+            usage = {
+                "prompt_tokens": _prompt_tokens(messages),
+                "completion_tokens": len(tokens),
+                "total_tokens": _prompt_tokens(messages) + len(tokens),
+            }
+            per_token = 1 / script.tokens_per_sec if script.tokens_per_sec else 0.0
+            time.sleep(script.delay())
+
+            if not body.get("stream"):
+                time.sleep(per_token * len(tokens))
+                self._json(200, {
+                    "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def event(choices, **extra):
+                chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                         "created": int(time.time()), "model": model, "choices": choices, **extra}
+                self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+            try:
+                for token in tokens:
+                    event([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+                    time.sleep(per_token)
+                event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    event([], usage=usage)
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client hung up mid-stream
+                self.close_connection = True
+
+    return Handler
+
+
+def _inventory_names(path):
+    with open(path, newline="") as f:
+        return [row["name"] for row in csv.DictReader(f) if row.get("name")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to --latency")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="generation rate; 0 is instant")
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--tag-rate", type=float, default=0.0,
+                        help="share of replies that end with a calculate_cost tag")
+    parser.add_argument("--inventory", help="CSV to take tagged item names from")
+    parser.add_argument("--script", help="JSON list of replies to send in turn instead of filler")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    replies = ()
+    if args.script:
+        with open(args.script) as f:
+            replies = json.load(f)
+    script = Script(
+        latency=args.latency, jitter=args.jitter, tokens_per_sec=args.tokens_per_sec,
+        reply_tokens=args.reply_tokens, tag_rate=args.tag_rate, error_rate=args.error_rate,
+        names=_inventory_names(args.inventory) if args.inventory else (), replies=replies, seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(script))
+    server.daemon_threads = True
+    print(f"Fake OpenAI API on http://{args.host}:{server.server_port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
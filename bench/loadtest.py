@@ -0,0 +1,395 @@
+"""Replay recorded conversations against the chat app and report latency,
+throughput, cookie size and memory.
+
+Start the app against the fake API and a synthetic catalog, then run:
+
+    python bench/loadtest.py --launch --rows 10 1000 100000 --concurrency 16 \
+        --latency 0.3 --tokens-per-sec 80 --tag-rate 0.3
+
+or point it at an app that's already running (pass --pid to sample its
+memory):
+
+    python bench/loadtest.py --url http://127.0.0.1:5000 --pid 12345
+
+Each conversation in --conversations (a JSON list of {"name", "turns"}) is
+played --repeat times, each time as a fresh client with its own cookies:
+every turn is POSTed to /chat (or /chat/stream with --stream) and the
+conversation ends with /reset. --json appends the results to a file so
+runs can be compared.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import queue
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synth_inventory import write_inventory  # noqa: E402
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of `values`, or None if there are none."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def memory_kb(pid):
+    """(VmRSS, VmHWM) of a process in kB, or (None, None) where /proc isn't available."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    fields[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return fields.get("VmRSS"), fields.get("VmHWM")
+
+
+class MemorySampler(threading.Thread):
+    """Polls a process's RSS so the report can show the peak during the run."""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            rss, _ = memory_kb(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class Client:
+    """One browser: a keep-alive connection and a cookie jar."""
+
+    def __init__(self, host, port, timeout=60):
+        self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        self.cookies = {}
+
+    def post(self, path, payload, stream=False):
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json"}
+        cookie = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        if cookie:
+            headers["Cookie"] = cookie
+        sample = {"endpoint": path, "status": "error", "ttfb": None, "cookie_bytes": len(cookie),
+                  "set_cookie_bytes": 0, "response_bytes": 0}
+
+        start = time.perf_counter()
+        try:
+            self.conn.request("POST", path, body, headers)
+            response = self.conn.getresponse()
+            sample["status"] = str(response.status)
+            if stream:
+                event = None
+                for line in iter(response.readline, b""):
+                    sample["response_bytes"] += len(line)
+                    if line.startswith(b"event:"):
+                        event = line[6:].strip()
+                    elif line.startswith(b"data:"):
+                        if sample["ttfb"] is None:
+                            sample["ttfb"] = time.perf_counter() - start
+                        if event == b"error":
+                            sample["status"] = "stream_error"
+                        event = None
+            else:
+                sample["response_bytes"] = len(response.read())
+        except (OSError, http.client.HTTPException) as exc:
+            self.conn.close()
+            sample["status"] = type(exc).__name__
+            sample["latency"] = time.perf_counter() - start
+            return sample
+        sample["latency"] = time.perf_counter() - start
+
+        for header in response.headers.get_all("Set-Cookie") or []:
+            sample["set_cookie_bytes"] += len(header)
+            name, _, value = header.split(";", 1)[0].partition("=")
+            if value:
+                self.cookies[name.strip()] = value
+            else:
+                self.cookies.pop(name.strip(), None)
+        return sample
+
+    def close(self):
+        self.conn.close()
+
+
+def play(host, port, conversation, stream, timeout):
+    client = Client(host, port, timeout)
+    try:
+        samples = [
+            client.post("/chat/stream" if stream else "/chat", {"message": turn}, stream=stream)
+            for turn in conversation["turns"]
+        ]
+        samples.append(client.post("/reset", {}))
+    finally:
+        client.close()
+    return samples
+
+
+def run_load(url, conversations, concurrency=8, repeat=3, stream=False, pid=None, timeout=60):
+    parts = urllib.parse.urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    jobs = queue.Queue()
+    for _ in range(repeat):
+        for conversation in conversations:
+            jobs.put(conversation)
+    samples = []
+    samples_lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                conversation = jobs.get_nowait()
+            except queue.Empty:
+                return
+            played = play(host, port, conversation, stream, timeout)
+            with samples_lock:
+                samples.extend(played)
+
+    rss_before = memory_kb(pid)[0] if pid else None
+    sampler = MemorySampler(pid) if pid else None
+    if sampler:
+        sampler.start()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if sampler:
+        sampler.stop()
+    rss_after, hwm = memory_kb(pid) if pid else (None, None)
+
+    return summarize(samples, elapsed, {
+        "concurrency": concurrency,
+        "conversations": len(conversations) * repeat,
+        "stream": stream,
+        "rss_before_kb": rss_before,
+        "rss_after_kb": rss_after,
+        "rss_peak_kb": sampler.peak if sampler else None,
+        "rss_hwm_kb": hwm,
+    })
+
+
+def summarize(samples, elapsed, extra):
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    endpoints = {}
+    for endpoint in sorted({s["endpoint"] for s in samples}):
+        group = [s for s in samples if s["endpoint"] == endpoint]
+        latencies = [s["latency"] for s in group]
+        ttfbs = [s["ttfb"] for s in group if s["ttfb"] is not None]
+        endpoints[endpoint] = {
+            "requests": len(group),
+            "errors": sum(1 for s in group if not s["status"].startswith(("2", "3"))),
+            "p50_ms": ms(percentile(latencies, 50)),
+            "p95_ms": ms(percentile(latencies, 95)),
+            "p99_ms": ms(percentile(latencies, 99)),
+            "max_ms": ms(max(latencies)),
+            "ttfb_p50_ms": ms(percentile(ttfbs, 50)),
+            "ttfb_p95_ms": ms(percentile(ttfbs, 95)),
+        }
+
+    cookie_sizes = [s["cookie_bytes"] for s in samples]
+    set_cookie_sizes = [s["set_cookie_bytes"] for s in samples if s["set_cookie_bytes"]]
+    return {
+        **extra,
+        "requests": len(samples),
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(samples) / elapsed, 1) if elapsed else None,
+        "cookie_bytes_max": max(cookie_sizes, default=0),
+        "cookie_bytes_mean": round(sum(cookie_sizes) / len(cookie_sizes), 1) if cookie_sizes else 0,
+        "set_cookie_bytes_max": max(set_cookie_sizes, default=0),
+        "endpoints": endpoints,
+    }
+
+
+def print_report(result, label=""):
+    print(f"== {label or 'run'}: {result['conversations']} conversations, concurrency {result['concurrency']}"
+          f"{', streaming' if result['stream'] else ''}")
+    print(f"   {result['requests']} requests in {result['elapsed_s']} s = {result['rps']} req/s, "
+          f"{result['errors']} errors")
+    for endpoint, stats in result["endpoints"].items():
+        line = (f"   {endpoint:<13} n={stats['requests']:<5} p50 {stats['p50_ms']} ms  "
+                f"p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms  max {stats['max_ms']} ms")
+        if stats["ttfb_p50_ms"] is not None:
+            line += f"  first byte p50 {stats['ttfb_p50_ms']} ms  p95 {stats['ttfb_p95_ms']} ms"
+        print(line)
+    print(f"   Cookie header max {result['cookie_bytes_max']} B (mean {result['cookie_bytes_mean']} B), "
+          f"Set-Cookie max {result['set_cookie_bytes_max']} B")
+    if result["rss_after_kb"] is not None:
+        print(f"   server RSS {result['rss_before_kb'] / 1024:.1f} MB before, "
+              f"{result['rss_after_kb'] / 1024:.1f} MB after, peak {(result['rss_peak_kb'] or 0) / 1024:.1f} MB "
+              f"(high water mark {result['rss_hwm_kb'] / 1024:.1f} MB)")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(host, port, process, path="/", timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"process exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", path)
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"nothing listening on {host}:{port} after {timeout} s")
+
+
+class Launched:
+    """The fake API and the app as subprocesses, in a scratch directory so
+    the history database and any generated catalog start empty."""
+
+    def __init__(self, args, rows=None):
+        self.workdir = tempfile.TemporaryDirectory(prefix="clink-loadtest-")
+        if rows:
+            inventory = write_inventory(os.path.join(self.workdir.name, "inventory.csv"), rows)
+        else:
+            inventory = os.path.join(REPO_DIR, "inventory.csv")
+
+        self.processes = []
+        self.log = open(os.path.join(self.workdir.name, "processes.log"), "w+")
+        api_port = _free_port()
+        fake = [
+            sys.executable, os.path.join(BENCH_DIR, "fake_openai.py"), "--port", str(api_port),
+            "--latency", str(args.latency), "--jitter", str(args.jitter),
+            "--tokens-per-sec", str(args.tokens_per_sec), "--reply-tokens", str(args.reply_tokens),
+            "--tag-rate", str(args.tag_rate), "--error-rate", str(args.error_rate), "--inventory", inventory,
+        ]
+        if args.script:
+            fake += ["--script", os.path.abspath(args.script)]
+        self._start(fake, api_port, "/v1/models", os.environ)
+
+        self.port = _free_port()
+        env = dict(os.environ, PORT=str(self.port), OPENAI_API_KEY="fake",
+                   OPENAI_BASE_URL=f"http://127.0.0.1:{api_port}/v1", INVENTORY_PATH=inventory,
+                   HISTORY_BACKEND=args.history_backend)
+        env.update(pair.split("=", 1) for pair in args.env)
+        self.app = self._start([sys.executable, os.path.join(REPO_DIR, "Chatbot.py")], self.port, "/", env)
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def _start(self, command, port, ready_path, env):
+        process = subprocess.Popen(command, cwd=self.workdir.name, env=env,
+                                   stdout=self.log, stderr=subprocess.STDOUT)
+        self.processes.append(process)
+        try:
+            _wait_until_up("127.0.0.1", port, process, ready_path)
+        except RuntimeError as exc:
+            self.close()
+            raise RuntimeError(f"{os.path.basename(command[-1])} didn't start: {exc}") from None
+        return process
+
+    def close(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.log.seek(0)
+        output = self.log.read()
+        self.log.close()
+        self.workdir.cleanup()
+        return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    target = parser.add_argument_group("target")
+    target.add_argument("--url", help="an app that's already running")
+    target.add_argument("--pid", type=int, help="its process id, to sample memory")
+    target.add_argument("--launch", action="store_true", help="start the fake API and the app here")
+    target.add_argument("--rows", type=int, nargs="*", default=[],
+                        help="synthetic catalog sizes to run against in turn (with --launch); "
+                             "by default the repo's inventory.csv")
+    target.add_argument("--history-backend", default="sqlite", choices=["sqlite", "memory"])
+    target.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the launched app, e.g. METRICS_ENABLED=1")
+
+    load = parser.add_argument_group("load")
+    load.add_argument("--conversations", default=os.path.join(BENCH_DIR, "conversations.json"))
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--repeat", type=int, default=3, help="times each conversation is played")
+    load.add_argument("--stream", action="store_true", help="use /chat/stream instead of /chat")
+    load.add_argument("--timeout", type=float, default=60)
+    load.add_argument("--json", help="append the results to this file, one JSON object per line")
+
+    fake = parser.add_argument_group("fake API (with --launch)")
+    fake.add_argument("--latency", type=float, default=0.3)
+    fake.add_argument("--jitter", type=float, default=0.0)
+    fake.add_argument("--tokens-per-sec", type=float, default=0.0)
+    fake.add_argument("--reply-tokens", type=int, default=40)
+    fake.add_argument("--tag-rate", type=float, default=0.3)
+    fake.add_argument("--error-rate", type=float, default=0.0)
+    fake.add_argument("--script")
+    args = parser.parse_args(argv)
+
+    if bool(args.url) == args.launch:
+        parser.error("pass either --url or --launch")
+    with open(args.conversations) as f:
+        conversations = json.load(f)
+
+    runs = []
+    if args.launch:
+        for rows in args.rows or [None]:
+            label = f"{rows} rows" if rows else "inventory.csv"
+            launched = Launched(args, rows)
+            try:
+                result = run_load(launched.url, conversations, args.concurrency, args.repeat, args.stream,
+                                  launched.app.pid, args.timeout)
+            finally:
+                output = launched.close()
+            if result["errors"] and output.strip():
+                print(output[-2000:], file=sys.stderr)
+            runs.append((label, dict(result, rows=rows)))
+    else:
+        result = run_load(args.url, conversations, args.concurrency, args.repeat, args.stream,
+                          args.pid, args.timeout)
+        runs.append((args.url, result))
+
+    for label, result in runs:
+        print_report(result, label)
+        if args.json:
+            with open(args.json, "a") as f:
+                f.write(json.dumps(dict(result, label=label, time=time.time())) + "\n")
+
+
+if __name__ == "__main__":
+    main()
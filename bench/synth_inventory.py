@@ -0,0 +1,84 @@
+"""Generate synthetic inventory.csv files shaped like the real one.
+
+    python bench/synth_inventory.py 50000 /tmp/inventory_50k.csv
+    python bench/synth_inventory.py --sweep /tmp/inventories
+
+--sweep writes one file per size in SWEEP_SIZES, named inventory_<rows>.csv.
+"""
+import csv
+import os
+import random
+import sys
+
+FIELDS = ["name", "category", "color", "color_id", "price_clink", "price_home_depot",
+          "available", "length_in", "width_in", "height_in", "num_holes"]
+
+CATEGORIES = {
+    "brick": (9.5, 2.5, 2.75),
+    "tile": (12.0, 12.0, 0.375),
+    "paver": (8.0, 4.0, 2.375),
+    "sheet": (96.0, 48.0, 0.5),
+    "wood": (96.0, 3.5, 1.5),
+    "block": (15.625, 7.625, 7.625),
+}
+COLORS = {
+    "red": "#B65A43", "white": "#E8E4DA", "brown": "#8B5C3A", "gray": "#8C8C8C",
+    "tan": "#C8A97E", "black": "#2B2B2B", "blue": "#4A6A8A", "green": "#5E7D4E",
+}
+FINISHES = ["Rustic", "Smooth", "Antique", "Tumbled", "Glazed", "Matte", "Textured", "Classic"]
+MATERIALS = ["Clay", "Concrete", "Stone", "Ceramic", "Porcelain", "Cedar", "Pine", "Slate"]
+
+SWEEP_SIZES = (10, 100, 1000, 10000, 100000)
+
+
+def _jitter_hex(hex_color, rng):
+    channels = [int(hex_color[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{max(0, min(255, c + rng.randint(-24, 24))):02X}" for c in channels)
+
+
+def generate_rows(count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        category = rng.choice(list(CATEGORIES))
+        color = rng.choice(list(COLORS))
+        length, width, height = CATEGORIES[category]
+        clink = round(rng.uniform(0.3, 40.0), 2)
+        yield {
+            "name": f"{rng.choice(FINISHES)} {color.title()} {rng.choice(MATERIALS)} "
+                    f"{category.title()}s {i:06d}",
+            "category": category,
+            "color": color,
+            "color_id": _jitter_hex(COLORS[color], rng),
+            "price_clink": f"{clink:.2f}",
+            "price_home_depot": f"{clink * rng.uniform(1.5, 3.0):.2f}" if rng.random() > 0.1 else "",
+            "available": rng.choice([0, rng.randint(1, 50), rng.randint(50, 5000)]),
+            "length_in": f"{length * rng.uniform(0.8, 1.2):.2f}",
+            "width_in": f"{width * rng.uniform(0.8, 1.2):.2f}",
+            "height_in": f"{height * rng.uniform(0.8, 1.2):.2f}",
+            "num_holes": rng.choice([0, 0, 3, 4, 10]) if category in ("brick", "block") else 0,
+        }
+
+
+def write_inventory(path, count, seed=0):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(generate_rows(count, seed))
+    return path
+
+
+def write_sweep(directory, sizes=SWEEP_SIZES, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    return [write_inventory(os.path.join(directory, f"inventory_{size}.csv"), size, seed) for size in sizes]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--sweep":
+        directory = sys.argv[2] if len(sys.argv) > 2 else "."
+        for path in write_sweep(directory):
+            print(f"Wrote {path}")
+        sys.exit()
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    path = sys.argv[2] if len(sys.argv) > 2 else f"inventory_{count}.csv"
+    write_inventory(path, count)
+    print(f"Wrote {count} rows to {path}")
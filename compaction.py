@@ -0,0 +1,150 @@
+import re
+import threading
+
+from intent import find_mentions, parse_quantity
+from retrieval import estimate_tokens
+
+# Per-message overhead the chat format adds on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# The pricing message cost_reply() renders once a material is agreed
+_AGREED = re.compile(r"You will need (\d+) (.+?) for your project\.")
+
+# How many of each kind of fact the summary keeps
+_MAX_FACTS = 5
+
+
+def count_tokens(message):
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _remember(facts, value):
+    if value in facts:
+        facts.remove(value)
+    facts.append(value)
+    del facts[:-_MAX_FACTS]
+
+
+class CompactionStats:
+    """Running totals of how much history compaction has saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.compacted_requests = 0
+        self.history_tokens = 0
+        self.sent_tokens = 0
+
+    def record(self, history_tokens, sent_tokens):
+        with self._lock:
+            self.requests += 1
+            self.history_tokens += history_tokens
+            self.sent_tokens += sent_tokens
+            if sent_tokens < history_tokens:
+                self.compacted_requests += 1
+
+    @property
+    def tokens_saved(self):
+        return self.history_tokens - self.sent_tokens
+
+
+class HistoryCompactor:
+    """Keeps the prompt's share of the conversation bounded.
+
+    The last `keep_turns` user/assistant turns are sent verbatim, fewer if
+    they don't fit in `token_budget` (the newest message always goes).
+    Everything older is folded into a rolling summary of the facts that
+    matter for an order: the project, the materials and quantities our
+    replies priced, and the colors, categories and quantities discussed.
+    The summary state is saved with the session and only the messages newly
+    pushed out of the window are folded into it on each turn.
+    """
+
+    def __init__(self, store, catalog, keep_turns=6, token_budget=1500):
+        self.store = store
+        self.catalog = catalog
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.stats = CompactionStats()
+
+    def _cut(self, history):
+        """Index of the first message to keep verbatim."""
+        cut = max(0, len(history) - 2 * self.keep_turns)
+        budget = self.token_budget
+        for i in range(len(history) - 1, cut - 1, -1):
+            budget -= count_tokens(history[i])
+            if budget < 0 and i < len(history) - 1:
+                cut = i + 1
+                break
+        # Start the verbatim part on a user message rather than mid-turn
+        while cut and cut < len(history) - 1 and history[cut]["role"] != "user":
+            cut += 1
+        return cut
+
+    def _new_summary(self):
+        return {"upto": 0, "project": None, "agreed": [], "colors": [], "categories": [], "quantities": []}
+
+    def _fold(self, summary, messages):
+        for message in messages:
+            content = message["content"]
+            if message["role"] == "user":
+                if summary["project"] is None:
+                    summary["project"] = content[:200]
+                # What the customer asked for isn't agreed until a reply priced it
+                quantity = parse_quantity(content)
+                if quantity:
+                    _remember(summary["quantities"], quantity)
+            elif message["role"] == "assistant":
+                # Only the pricing message counts: a raw cost tag left in a
+                # reply means the item wasn't in the inventory
+                for quantity, name in _AGREED.findall(content):
+                    _remember(summary["agreed"], f"{quantity} × {name}")
+            categories, colors = find_mentions(content, self.catalog)
+            for category in categories:
+                _remember(summary["categories"], category)
+            for color in colors:
+                _remember(summary["colors"], color)
+        return summary
+
+    def render(self, summary):
+        lines = ["Summary of the earlier part of this conversation:"]
+        if summary["project"]:
+            lines.append(f"- Customer opened with: {summary['project']}")
+        if summary["agreed"]:
+            lines.append(f"- Materials and quantities already priced: {'; '.join(summary['agreed'])}")
+        if summary["categories"]:
+            lines.append(f"- Categories discussed: {', '.join(summary['categories'])}")
+        if summary["colors"]:
+            lines.append(f"- Colors discussed: {', '.join(summary['colors'])}")
+        if summary["quantities"]:
+            lines.append(f"- Quantities mentioned: {', '.join(str(q) for q in summary['quantities'])}")
+        return "\n".join(lines)
+
+    def compact(self, session_id, history):
+        """Return (messages, tokens_saved): the messages to send in place of
+        `history` (a summary message, if anything has been folded, followed
+        by the recent turns) and how many tokens that saves."""
+        cut = self._cut(history)
+        summary = self.store.load_summary(session_id)
+        if summary is not None and summary["upto"] > len(history):
+            # The history was reset or expired underneath the summary
+            self.store.clear_summary(session_id)
+            summary = None
+        if cut and summary is None:
+            summary = self._new_summary()
+
+        if summary is not None and cut > summary["upto"]:
+            self._fold(summary, history[summary["upto"]:cut])
+            summary["upto"] = cut
+            self.store.save_summary(session_id, summary)
+
+        # Once folded, a message stays folded even if the window would fit it again
+        start = summary["upto"] if summary else 0
+        messages = history[start:]
+        if start:
+            messages = [{"role": "system", "content": self.render(summary)}] + messages
+
+        history_tokens = sum(count_tokens(m) for m in history)
+        sent_tokens = sum(count_tokens(m) for m in messages)
+        self.stats.record(history_tokens, sent_tokens)
+        return messages, history_tokens - sent_tokens
@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cache import LRUCache
+
+
+class MemoryHistoryStore:
+    """Conversation history kept in process memory. Handy for local dev;
+    history is lost on restart and isn't shared between workers."""
+
+    def __init__(self, ttl=86400, max_sessions=10000):
+        self._sessions = LRUCache(maxsize=max_sessions, ttl=ttl)
+        self._summaries = LRUCache(maxsize=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        return list(self._sessions.get(session_id, ()))
+
+    def append(self, session_id, messages):
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is None:
+                # New or expired session: don't let an old summary outlive it
+                self._summaries.pop(session_id)
+                history = []
+            self._sessions.set(session_id, history + list(messages))
+
+    def clear(self, session_id):
+        self._sessions.pop(session_id)
+        self._summaries.pop(session_id)
+
+    def load_summary(self, session_id):
+        return self._summaries.get(session_id)
+
+    def save_summary(self, session_id, summary):
+        self._summaries.set(session_id, summary)
+
+    def clear_summary(self, session_id):
+        self._summaries.pop(session_id)
+
+
+class SQLiteHistoryStore:
+    """Conversation history in SQLite, one row per message.
+
+    Turns are appended as new rows, so a long conversation never gets
+    rewritten. Recently used sessions are cached in memory along with the
+    seq range they cover; a load checks that range against the table (an
+    index lookup) and only fetches rows newer than the cached ones, which
+    keeps the cache correct when several worker processes share the file.
+    Sessions idle for longer than `ttl` seconds are treated as empty and
+    purged in the background of later writes.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS messages (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS messages_session_seq ON messages (session_id, seq);
+    CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+    CREATE TABLE IF NOT EXISTS summaries (
+        session_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path, ttl=86400, cache_size=2048, purge_interval=600):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._cache = LRUCache(maxsize=cache_size, ttl=ttl)
+        self._local = threading.local()
+        self._next_purge = time.monotonic() + purge_interval
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT s.updated_at, MIN(m.seq), MAX(m.seq) FROM sessions s "
+            "LEFT JOIN messages m ON m.session_id = s.session_id WHERE s.session_id = ?",
+            (session_id,),
+        ).fetchone()
+        updated_at, first_seq, last_seq = row
+        if updated_at is None or first_seq is None or updated_at < time.time() - self.ttl:
+            self._cache.pop(session_id)
+            return []
+
+        cached = self._cache.get(session_id)
+        if cached and cached[0] == first_seq:
+            messages, cached_last = cached[1], cached[2]
+            if cached_last == last_seq:
+                return list(messages)
+            rows = conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND seq > ? AND seq <= ? ORDER BY seq",
+                (session_id, cached_last, last_seq),
+            ).fetchall()
+            messages = messages + [{"role": role, "content": content} for role, content in rows]
+        else:
+            rows = conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND seq <= ? ORDER BY seq",
+                (session_id, last_seq),
+            ).fetchall()
+            messages = [{"role": role, "content": content} for role, content in rows]
+
+        self._cache.set(session_id, (first_seq, messages, last_seq))
+        return list(messages)
+
+    def append(self, session_id, messages):
+        messages = list(messages)
+        if not messages:
+            return
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row and row[0] < now - self.ttl:
+                # The session expired: start it over rather than reviving the
+                # old transcript by bumping updated_at
+                self._cache.pop(session_id)
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+            conn.execute(
+                "INSERT INTO sessions (session_id, updated_at) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (session_id, now),
+            )
+            seqs = []
+            for message in messages:
+                cursor = conn.execute(
+                    "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                    (session_id, message["role"], message["content"]),
+                )
+                seqs.append(cursor.lastrowid)
+
+        # Extend the cached copy only if it was up to date before this write;
+        # otherwise the next load picks up the gap from the table.
+        cached = self._cache.get(session_id)
+        if cached and cached[2] < seqs[0] and not self._has_rows_between(conn, session_id, cached[2], seqs[0]):
+            self._cache.set(session_id, (cached[0], cached[1] + messages, seqs[-1]))
+
+        if time.monotonic() >= self._next_purge:
+            self.purge_expired()
+
+    def _has_rows_between(self, conn, session_id, low, high):
+        return conn.execute(
+            "SELECT 1 FROM messages WHERE session_id = ? AND seq > ? AND seq < ? LIMIT 1",
+            (session_id, low, high),
+        ).fetchone() is not None
+
+    def clear(self, session_id):
+        self._cache.pop(session_id)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def load_summary(self, session_id):
+        row = self._connect().execute(
+            "SELECT data FROM summaries WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_summary(self, session_id, summary):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO summaries (session_id, data) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data",
+                (session_id, json.dumps(summary)),
+            )
+
+    def clear_summary(self, session_id):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+
+    def purge_expired(self):
+        self._next_purge = time.monotonic() + self.purge_interval
+        cutoff = time.time() - self.ttl
+        conn = self._connect()
+        with conn:
+            for table in ("messages", "summaries"):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE session_id IN "
+                    "(SELECT session_id FROM sessions WHERE updated_at < ?)",
+                    (cutoff,),
+                )
+            conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+
+
+def make_history_store(backend, ttl, directory="flask_session"):
+    """Build the history backend named by `backend` ("sqlite" or "memory")."""
+    if backend == "memory":
+        return MemoryHistoryStore(ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteHistoryStore(os.path.join(directory, "history.sqlite3"), ttl=ttl)
+    raise ValueError(f"Unknown history backend: {backend!r}")
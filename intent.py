@@ -0,0 +1,115 @@
+import re
+import threading
+
+from inventory import normalize_name
+
+# A bare count such as "80" or "1,200". Numbers glued to units ("6ft",
+# "12in", "$40") are dimensions or budgets, not quantities.
+_NUMBER = re.compile(r"(?<![\w.$#])(\d{1,3}(?:,\d{3})+|\d+)(?![\w.%'\"])")
+_DIMENSION = re.compile(
+    r"\d\s*(?:x|by|ft|feet|foot|in|inch|inches|sq|square|m|cm|mm|meter|meters|yd|yard|yards|"
+    r"hole|holes|%)\b|\d\s*['\"x×]",
+    re.IGNORECASE,
+)
+
+# Words that mean the number isn't an order: "I don't want 80 ...", "my budget
+# is 200 ...". Contractions normalize to "don t", hence the bare "t".
+_NEGATIONS = {"not", "no", "never", "dont", "wont", "cant", "t", "without", "cancel", "neither", "nor"}
+_MONEY_WORDS = {"budget", "spend", "spending", "spent", "dollar", "buck", "usd", "afford", "money", "cash"}
+_CURRENCY = re.compile(r"[$€£]")
+
+
+class _Vocabulary:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.longest_name = max((len(name.split()) for name in snapshot.by_name), default=0)
+        self.categories = {normalize_name(key): key for key in snapshot.by_category}
+        self.colors = {normalize_name(key): key for key in snapshot.by_color}
+
+
+_vocab = None
+_vocab_lock = threading.Lock()
+
+
+def _vocabulary(snapshot):
+    global _vocab
+    vocab = _vocab
+    if vocab is None or vocab.snapshot is not snapshot:
+        with _vocab_lock:
+            if _vocab is None or _vocab.snapshot is not snapshot:
+                _vocab = _Vocabulary(snapshot)
+            vocab = _vocab
+    return vocab
+
+
+def _mentions(words, vocab):
+    categories = [key for word, key in vocab.categories.items() if word in words]
+    colors = [key for word, key in vocab.colors.items() if word in words]
+    return categories, colors
+
+
+def find_mentions(message, catalog):
+    """Return the (categories, colors) from the inventory named in `message`."""
+    vocab = _vocabulary(catalog.snapshot())
+    return _mentions(set(normalize_name(message).split()), vocab)
+
+
+def parse_quantity(message):
+    if _DIMENSION.search(message):
+        return None
+    numbers = _NUMBER.findall(message)
+    if len(numbers) != 1:
+        return None
+    quantity = int(numbers[0].replace(",", ""))
+    return quantity if quantity > 0 else None
+
+
+def _item_at(words, snapshot, vocab, catalog):
+    """The single item named at the start of `words`: an optional color
+    followed by a full item name or a category, else None."""
+    def named(words, color=None):
+        for size in range(min(vocab.longest_name, len(words)), 0, -1):
+            item = snapshot.by_name.get(" ".join(words[:size]))
+            if item and (color is None or normalize_name(item["color"]) == color):
+                return item
+        return None
+
+    item = named(words)
+    if item or not words:
+        return item
+
+    color = None
+    if words[0] in vocab.colors:
+        color, words = words[0], words[1:]
+        item = named(words, color)
+        if item:
+            return item
+    if not words or words[0] not in vocab.categories:
+        return None
+    matches = catalog.filter(category=vocab.categories[words[0]],
+                             color=vocab.colors[color] if color else None)
+    return matches[0] if len(matches) == 1 else None
+
+
+def parse_order(message, catalog):
+    """Recognize an explicit order like "I want 80 white clay bricks".
+
+    Returns (item, quantity) only when the message has exactly one plain
+    quantity and it sits right before a single inventory item: its full
+    name, or a category (optionally preceded by a color) that narrows the
+    catalog down to one row. Negated orders and numbers that look like
+    money are left alone. Anything less certain returns None so the model
+    handles it.
+    """
+    quantity = parse_quantity(message)
+    if quantity is None or _CURRENCY.search(message):
+        return None
+    words = set(normalize_name(message).split())
+    if words & _NEGATIONS or words & _MONEY_WORDS:
+        return None
+
+    snapshot = catalog.snapshot()
+    vocab = _vocabulary(snapshot)
+    number = _NUMBER.search(message)
+    item = _item_at(normalize_name(message[number.end():]).split(), snapshot, vocab, catalog)
+    return (item, quantity) if item else None
@@ -0,0 +1,171 @@
+import csv
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def parse_row(row):
+    row["price_clink"] = float(row["price_clink"])
+    row["price_home_depot"] = float(row["price_home_depot"]) if row["price_home_depot"] else None
+    row["available"] = int(row["available"])
+    row["length_in"] = float(row["length_in"]) if row["length_in"] else None
+    row["width_in"] = float(row["width_in"]) if row["width_in"] else None
+    row["height_in"] = float(row["height_in"]) if row["height_in"] else None
+    return row
+
+
+def load_inventory(path="inventory.csv"):
+    with open(path, "r", newline="") as f:
+        return [parse_row(row) for row in csv.DictReader(f)]
+
+
+def _load_complete(path):
+    """Like load_inventory(), but rejects a file that looks partially written:
+    no rows at all, or a row with missing or extra fields."""
+    with open(path, "r", newline="") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError("no rows")
+    for line, row in enumerate(rows, start=2):
+        if None in row or None in row.values():
+            raise ValueError(f"line {line} has the wrong number of fields")
+    return [parse_row(row) for row in rows]
+
+
+# Name normalization so "white clay brick", "White-Clay Bricks" and
+# "WHITE CLAY BRICKS." all land on the same key
+_NON_WORD = re.compile(r"[^a-z0-9#]+")
+
+
+def _singular(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name):
+    words = _NON_WORD.sub(" ", str(name).lower()).split()
+    return " ".join(_singular(w) for w in words)
+
+
+def normalize_key(value):
+    return str(value).strip().lower()
+
+
+class _Snapshot:
+    """An immutable view of the inventory plus its lookup indexes.
+
+    Readers grab a reference to one snapshot and use it for the whole lookup,
+    so a reload swapping in a new snapshot never changes data under them.
+    """
+
+    def __init__(self, items, version, stamp):
+        self.items = items
+        self.version = version
+        self.stamp = stamp
+        self.by_name = {}
+        self.by_category = {}
+        self.by_color = {}
+        self.by_holes = {}
+
+        for item in items:
+            self.by_name.setdefault(normalize_name(item["name"]), item)
+            self.by_category.setdefault(normalize_key(item["category"]), []).append(item)
+            self.by_color.setdefault(normalize_key(item["color"]), []).append(item)
+            self.by_holes.setdefault(normalize_key(item["num_holes"]), []).append(item)
+
+
+class InventoryCatalog:
+    """Indexed inventory that reloads itself when the CSV changes on disk.
+
+    The file is stat'ed at most once every `check_interval` seconds. When its
+    mtime or size changes, one caller rebuilds the indexes while everyone
+    else keeps reading the previous snapshot. A file that fails to parse,
+    is empty or has a short row leaves the previous snapshot in place until
+    the file changes again.
+
+    That catches most files read mid-write, but not one cut off exactly at
+    a row boundary. Writers should write a temp file in the same directory
+    and os.replace() it over the CSV so readers only ever see whole files.
+    """
+
+    def __init__(self, path="inventory.csv", check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._failed_stamp = None
+        self._snapshot = self._build(version=1)
+        self._next_check = time.monotonic() + self.check_interval
+
+    def _stamp(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _build(self, version):
+        stamp = self._stamp()
+        return _Snapshot(_load_complete(self.path), version, stamp)
+
+    def reload(self, force=False):
+        """Rebuild the indexes if the file changed. Never blocks readers."""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            current = self._snapshot
+            stamp = None
+            try:
+                stamp = self._stamp()
+                if not force and stamp in (current.stamp, self._failed_stamp):
+                    return False
+                self._snapshot = self._build(current.version + 1)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self._failed_stamp = stamp
+                logger.warning("Inventory reload from %s failed, keeping version %s: %s",
+                               self.path, current.version, e)
+                return False
+            logger.info("Inventory reloaded from %s (version %s, %s items)",
+                        self.path, self._snapshot.version, len(self._snapshot.items))
+            return True
+        finally:
+            self._next_check = time.monotonic() + self.check_interval
+            self._reload_lock.release()
+
+    def snapshot(self):
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        return self._snapshot
+
+    @property
+    def items(self):
+        return self.snapshot().items
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+    def find(self, name):
+        if not name:
+            return None
+        return self.snapshot().by_name.get(normalize_name(name))
+
+    def filter(self, category=None, color=None, num_holes=None):
+        snap = self.snapshot()
+        lists = [index.get(normalize_key(value), [])
+                 for index, value in ((snap.by_category, category),
+                                      (snap.by_color, color),
+                                      (snap.by_holes, num_holes))
+                 if value is not None]
+        if not lists:
+            return list(snap.items)
+        lists.sort(key=len)
+        others = [{id(item) for item in matches} for matches in lists[1:]]
+        return [item for item in lists[0] if all(id(item) in ids for ids in others)]
+
+    def __len__(self):
+        return len(self.snapshot().items)
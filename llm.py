@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+
+import httpx
+import openai
+from openai import OpenAI
+
+
+class Overloaded(Exception):
+    """Raised when every completion slot is taken; callers should shed load."""
+
+
+class LLMTimeout(Exception):
+    """Raised when a completion doesn't finish inside its deadline."""
+
+
+class LLMGateway:
+    """Shared OpenAI client for the whole process.
+
+    Every request thread goes through one client over a single pooled
+    httpx connection pool, so connections are kept alive and reused
+    instead of each call opening its own. Each call gets a deadline,
+    429/5xx and connection errors are retried with jittered exponential
+    backoff inside that deadline, and at most `max_concurrency` calls are
+    in flight: once they're all busy, new calls fail fast with Overloaded
+    rather than queueing.
+
+    Each call still holds its request thread for the whole round trip, so
+    the server's thread count is the real ceiling on concurrent
+    conversations. `max_concurrency` only sheds load if it is below that
+    count; set it a few under, so the spare threads can still serve pages,
+    quotes and 503s while every slot is busy.
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_concurrency=64, timeout=30.0,
+                 connect_timeout=5.0, max_retries=2, pool_size=100,
+                 backoff_base=0.25, backoff_cap=4.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._client = None
+
+    # The client is created on first use, so a pre-forking server gives each
+    # worker its own instead of sharing sockets across processes.
+    def _ensure_client(self):
+        with self._lock:
+            if self._client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=self.pool_size,
+                                        max_keepalive_connections=self.pool_size,
+                                        keepalive_expiry=30.0),
+                    timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                )
+                # Retries are handled here so they respect the per-call deadline
+                self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                      http_client=http_client, max_retries=0)
+        return self._client
+
+    def _admit(self):
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded("All completion slots are busy")
+
+    def _retryable(self, error):
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return isinstance(error, openai.APIConnectionError)
+
+    def _create(self, kwargs):
+        client = self._ensure_client()
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeout(f"No completion within {self.timeout}s")
+            timeout = httpx.Timeout(remaining, connect=min(self.connect_timeout, remaining))
+            try:
+                return client.chat.completions.create(**kwargs, timeout=timeout)
+            except openai.OpenAIError as e:
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                if (attempt >= self.max_retries or not self._retryable(e)
+                        or time.monotonic() + delay >= deadline):
+                    if isinstance(e, openai.APITimeoutError):
+                        raise LLMTimeout(f"No completion within {self.timeout}s") from e
+                    raise
+            attempt += 1
+            time.sleep(delay)
+
+    def complete(self, **kwargs):
+        """Blocking chat completion."""
+        self._admit()
+        try:
+            return self._create(kwargs)
+        finally:
+            self._slots.release()
+
+    def stream(self, **kwargs):
+        """Streaming chat completion as an iterator of chunks.
+
+        Admission happens right away, so an overloaded gateway raises here,
+        before the caller has started a response. The deadline covers
+        opening the stream; after that, each wait for a chunk may take as
+        long as was left of it when the stream opened. Close the iterator
+        to abandon the stream early.
+        """
+        self._admit()
+        try:
+            stream = self._create({**kwargs, "stream": True})
+        except BaseException:
+            self._slots.release()
+            raise
+        return CompletionStream(stream, self._slots.release)
+
+
+class CompletionStream:
+    """An open completion stream that gives its slot back once, when it is
+    exhausted, fails or is closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._chunks = iter(stream)
+        self._release = release
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            self.close()
+            raise
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            try:
+                self._stream.close()
+            finally:
+                self._release()
@@ -0,0 +1,322 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from flask.sessions import SecureCookieSessionInterface
+from werkzeug.wsgi import ClosingIterator
+
+request_logger = logging.getLogger("clink.requests")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, registry, name, help, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, registry, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket..., +Inf count], sum
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = _labels(self.label_names, key, [("le", _number(bound))])
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds the metrics and renders them in the Prometheus text format.
+
+    While disabled, every update returns straight away, so instrumented code
+    costs one attribute check per call.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._metrics = []
+        self._gauges = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(self, name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self, name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def reading(self, name, help, read, type="gauge"):
+        """A value read at scrape time from elsewhere, e.g. a cache's hit count."""
+        self._gauges.append((name, help, read, type))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help, read, type in self._gauges:
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {type}", f"{name} {_number(read())}"])
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.counter("clink_requests_total", "HTTP requests handled", ["endpoint", "status"])
+REQUEST_LATENCY = registry.histogram("clink_request_duration_seconds", "End-to-end request latency", ["endpoint"])
+PHASE_LATENCY = registry.histogram("clink_phase_duration_seconds", "Time spent in each phase of a request", ["phase"])
+FIRST_TOKEN_LATENCY = registry.histogram("clink_llm_first_token_seconds", "Time until a streamed completion's first token")
+LLM_TOKENS = registry.counter("clink_llm_tokens_total", "Tokens reported by the model API", ["kind"])
+LLM_COST = registry.counter("clink_llm_cost_usd_total", "Estimated model spend in USD")
+EVENTS = registry.counter(
+    "clink_events_total",
+    "Notable outcomes: cost tag hits, out-of-stock fallbacks, fast-path replies, cache hits, load shedding",
+    ["event"],
+)
+ERRORS = registry.counter("clink_errors_total", "Errors raised while handling requests", ["type"])
+
+
+class RequestRecord:
+    def __init__(self):
+        self.endpoint = "unmatched"
+        self.start = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.events = []
+        self.tokens = {}
+        self.cost = 0.0
+
+
+_local = threading.local()
+request_log = False
+_request_handler = None
+
+
+def enable_request_log(stream=None):
+    """Log one JSON line per request on `clink.requests`.
+
+    The logger gets a handler of its own (stderr by default) at INFO, so the
+    lines show up without any logging setup in the app; it doesn't also
+    propagate to the root logger, so they don't print twice if one exists.
+    """
+    global request_log, _request_handler
+    request_log = True
+    if _request_handler is None:
+        _request_handler = logging.StreamHandler(stream)
+        _request_handler.setFormatter(logging.Formatter("%(message)s"))
+        request_logger.addHandler(_request_handler)
+    request_logger.setLevel(logging.INFO)
+    request_logger.propagate = False
+
+
+def tracking():
+    return registry.enabled or request_log
+
+
+def current_request():
+    return getattr(_local, "record", None)
+
+
+def _finish_request(record, status):
+    if getattr(_local, "record", None) is record:
+        _local.record = None
+    elapsed = time.perf_counter() - record.start
+    REQUESTS.inc(endpoint=record.endpoint, status=status)
+    REQUEST_LATENCY.observe(elapsed, endpoint=record.endpoint)
+    if request_log:
+        request_logger.info(json.dumps({
+            "endpoint": record.endpoint,
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 2),
+            "phases_ms": {phase: round(seconds * 1000, 2) for phase, seconds in record.phases.items()},
+            "events": record.events,
+            "tokens": record.tokens,
+            "cost_usd": round(record.cost, 6),
+        }))
+
+
+class MetricsMiddleware:
+    """WSGI middleware that times each request from before its session
+    cookie is decoded until its body, streamed or not, has been sent, and
+    collects the phases recorded along the way."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if not tracking():
+            return self.wsgi_app(environ, start_response)
+
+        record = _local.record = RequestRecord()
+        status = []
+
+        def capture_status(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(" ", 1)[0]]
+            return start_response(status_line, headers, exc_info)
+
+        try:
+            body = self.wsgi_app(environ, capture_status)
+        except BaseException:
+            _finish_request(record, "500")
+            raise
+        return ClosingIterator(body, lambda: _finish_request(record, status[0] if status else "500"))
+
+
+class _Span:
+    __slots__ = ("phase", "start")
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        PHASE_LATENCY.observe(elapsed, phase=self.phase)
+        record = getattr(_local, "record", None)
+        if record is not None:
+            record.phases[self.phase] += elapsed
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def add_phase(phase, seconds):
+    """Record a duration measured by the caller as a phase of the current request."""
+    if not tracking():
+        return
+    PHASE_LATENCY.observe(seconds, phase=phase)
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record.phases[phase] += seconds
+
+
+def span(phase):
+    """Time a block as one phase of the current request:
+
+        with metrics.span("llm_call"):
+            ...
+    """
+    return _Span(phase) if tracking() else _NULL_SPAN
+
+
+def event(name):
+    if not tracking():
+        return
+    EVENTS.inc(event=name)
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record.events.append(name)
+
+
+def error(exc):
+    if not tracking():
+        return
+    ERRORS.inc(type=type(exc).__name__)
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record.events.append(f"error:{type(exc).__name__}")
+
+
+def record_usage(usage, input_price=0.0, output_price=0.0):
+    """Count the tokens from a completion's `usage`; prices are USD per 1M tokens."""
+    if usage is None or not tracking():
+        return
+    prompt = usage.prompt_tokens or 0
+    completion = usage.completion_tokens or 0
+    cost = (prompt * input_price + completion * output_price) / 1_000_000
+    LLM_TOKENS.inc(prompt, kind="prompt")
+    LLM_TOKENS.inc(completion, kind="completion")
+    LLM_COST.inc(cost)
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record.tokens = {"prompt": prompt, "completion": completion}
+        record.cost += cost
+
+
+class TimedSessionInterface(SecureCookieSessionInterface):
+    """Flask's cookie sessions, with decode and encode timed as phases."""
+
+    def open_session(self, app, request):
+        with span("session_decode"):
+            return super().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        with span("session_encode"):
+            return super().save_session(app, session, response)
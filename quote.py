@@ -0,0 +1,225 @@
+import bisect
+import heapq
+import math
+import threading
+from array import array
+
+from inventory import normalize_name
+
+# Add ~10% for breakage and cuts, rounded up to the nearest 5
+BUFFER = 1.1
+ROUND_TO = 5
+
+MAX_QUOTE_LINES = 1000
+
+# An alternative's "Distance" up to which it counts as a close match: about
+# the same color (red vs. rustic red is ~0.08, white vs. tan ~0.26) and size
+CLOSE_MATCH_DISTANCE = 0.15
+
+_MAX_COLOR_DISTANCE = math.sqrt(3 * 255 ** 2)
+
+
+def recommended_quantity(quantity):
+    # Round off float noise first: 100 * 1.1 is 110.00000000000001
+    return int(math.ceil(round(quantity * BUFFER / ROUND_TO, 9)) * ROUND_TO)
+
+
+def _rgb(color_id):
+    try:
+        value = int(str(color_id).lstrip("#"), 16)
+    except ValueError:
+        return None
+    return (value >> 16) & 255, (value >> 8) & 255, value & 255
+
+
+def _money(value):
+    # Same convention as calculate_cost(): missing or zero amounts are "N/A"
+    return round(value, 2) if value and not math.isnan(value) else "N/A"
+
+
+class _Columns:
+    """The inventory as parallel arrays, one entry per row."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.items = snapshot.items
+        self.row_of = {id(item): row for row, item in enumerate(self.items)}
+        nan = float("nan")
+        self.price_clink = array("d", (item["price_clink"] for item in self.items))
+        self.price_retail = array("d", (item["price_home_depot"] if item["price_home_depot"] else nan
+                                        for item in self.items))
+        self.available = array("q", (item["available"] for item in self.items))
+
+        # Per category: rows sorted by stock (most first) with a feature
+        # tuple each, so finding alternatives only scans rows that can cover
+        # the quantity and scores them without per-row function calls.
+        # Colors are scaled so black to white is 1; sizes are logged so a
+        # difference means a ratio. Missing values take the category median.
+        rows_by_category = {}
+        for row, item in enumerate(self.items):
+            rows_by_category.setdefault(item["category"], []).append(row)
+        self.features = [None] * len(self.items)
+        self.by_category = {}
+        for category, rows in rows_by_category.items():
+            rows.sort(key=lambda row: -self.available[row])
+            medians = [_median([self.items[row][key] for row in rows if self.items[row][key]]) or 1.0
+                       for key in _DIMENSIONS]
+            for row in rows:
+                item = self.items[row]
+                rgb = _rgb(item["color_id"]) or (128, 128, 128)
+                self.features[row] = tuple(c / _MAX_COLOR_DISTANCE for c in rgb) + tuple(
+                    math.log(item[key] or median) for key, median in zip(_DIMENSIONS, medians)
+                )
+            self.by_category[category] = (
+                rows,
+                array("q", (-self.available[row] for row in rows)),
+                [self.features[row] for row in rows],
+            )
+
+
+_DIMENSIONS = ("length_in", "width_in", "height_in")
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+
+_columns = None
+_columns_lock = threading.Lock()
+
+
+def _current_columns(snapshot):
+    global _columns
+    columns = _columns
+    if columns is None or columns.snapshot is not snapshot:
+        with _columns_lock:
+            if _columns is None or _columns.snapshot is not snapshot:
+                _columns = _Columns(snapshot)
+            columns = _columns
+    return columns
+
+
+def alternatives(columns, row, quantity, limit=3, allocated=None):
+    """In-stock rows in the same category that can cover `quantity`, closest
+    in color (hex distance) and size (length/width/height) first.
+
+    `allocated` maps rows to stock already promised elsewhere (e.g. to other
+    lines of the same quote); only what's left is offered.
+    """
+    allocated = allocated or {}
+    rows, neg_available, features = columns.by_category[columns.items[row]["category"]]
+    # rows are sorted by stock, so everything that can cover quantity is a prefix
+    end = bisect.bisect_right(neg_available, -quantity)
+    r0, g0, b0, l0, w0, h0 = columns.features[row]
+    scored = (
+        (math.sqrt((r - r0) ** 2 + (g - g0) ** 2 + (b - b0) ** 2)
+         + (abs(l - l0) + abs(w - w0) + abs(h - h0)) / 3, other)
+        for other, (r, g, b, l, w, h) in zip(rows[:end], features[:end])
+        if other != row
+        and (other not in allocated or columns.available[other] - allocated[other] >= quantity)
+    )
+    return [
+        {
+            "Material Name": columns.items[other]["name"],
+            "Color": columns.items[other]["color"],
+            "Available": columns.available[other] - allocated.get(other, 0),
+            "Clink Price": round(columns.price_clink[other] * quantity, 2),
+            "Distance": round(distance, 3),
+        }
+        for distance, other in heapq.nsmallest(limit, scored)
+    ]
+
+
+def quote_lines(lines, catalog, alternatives_limit=3):
+    """Price a whole bill of materials at once.
+
+    `lines` is a list of {"name": ..., "quantity": ...}. Each line comes back
+    with the same figures calculate_cost() produces plus a "Status" of "ok",
+    "insufficient_stock" or "not_found"; lines we can't fill list in-stock
+    alternatives from the same category. Lines naming the same item share
+    its stock, earlier lines first, and "Available" is what was left for the
+    line; alternatives only offer stock the quote's fillable lines don't use. Totals cover the fillable lines; the retail ones only those with
+    a retail price ("Retail Price Partial" says whether any were left out).
+    """
+    snapshot = catalog.snapshot()
+    columns = _current_columns(snapshot)
+
+    rows = []
+    for line in lines:
+        item = snapshot.by_name.get(normalize_name(line["name"]))
+        rows.append(columns.row_of[id(item)] if item else -1)
+    quantities = [int(line["quantity"]) for line in lines]
+
+    found = [row >= 0 for row in rows]
+    unit_clink = [columns.price_clink[row] if ok else 0.0 for row, ok in zip(rows, found)]
+    unit_retail = [columns.price_retail[row] if ok else math.nan for row, ok in zip(rows, found)]
+
+    # Lines for the same item draw on one pool of stock, in the order given
+    stock = []
+    fillable = []
+    allocated = {}
+    for row, ok, q in zip(rows, found, quantities):
+        left = columns.available[row] - allocated.get(row, 0) if ok else 0
+        stock.append(left)
+        fillable.append(ok and q <= left)
+        if fillable[-1]:
+            allocated[row] = allocated.get(row, 0) + q
+
+    rec_quantities = [recommended_quantity(q) for q in quantities]
+    clink = [u * q for u, q in zip(unit_clink, quantities)]
+    retail = [u * q for u, q in zip(unit_retail, quantities)]
+    rec_clink = [u * q for u, q in zip(unit_clink, rec_quantities)]
+    rec_retail = [u * q for u, q in zip(unit_retail, rec_quantities)]
+
+    results = []
+    for i, line in enumerate(lines):
+        result = {"Material Name": line["name"], "Requested Quantity": quantities[i]}
+        if not found[i]:
+            result["Status"] = "not_found"
+            results.append(result)
+            continue
+
+        result["Material Name"] = columns.items[rows[i]]["name"]
+        result["Available"] = stock[i]
+        if not fillable[i]:
+            result["Status"] = "insufficient_stock"
+            result["Alternatives"] = alternatives(columns, rows[i], quantities[i], alternatives_limit, allocated)
+            results.append(result)
+            continue
+
+        result.update({
+            "Status": "ok",
+            "Clink Price": round(clink[i], 2),
+            "Retail Price": _money(retail[i]),
+            "Savings": _money(retail[i] - clink[i]),
+
+            "Recommended Quantity": rec_quantities[i],
+            "Recommended Price Clink": round(rec_clink[i], 2),
+            "Recommended Price Home Depot": _money(rec_retail[i]),
+            "Recommended Savings": _money(rec_retail[i] - rec_clink[i]),
+        })
+        results.append(result)
+
+    # Retail totals and savings only cover lines that have a retail price,
+    # so they compare like with like
+    priced = [ok and not math.isnan(u) for ok, u in zip(fillable, unit_retail)]
+
+    def total(values, include=fillable):
+        return round(sum(v for v, ok in zip(values, include) if ok), 2)
+
+    return {
+        "lines": results,
+        "totals": {
+            "Lines": len(lines),
+            "Fillable Lines": sum(fillable),
+            "Clink Price": total(clink),
+            "Recommended Price Clink": total(rec_clink),
+            "Retail Priced Lines": sum(priced),
+            "Retail Price Partial": sum(priced) < sum(fillable),
+            "Retail Price": total(retail, priced),
+            "Savings": round(total(retail, priced) - total(clink, priced), 2),
+            "Recommended Price Home Depot": total(rec_retail, priced),
+            "Recommended Savings": round(total(rec_retail, priced) - total(rec_clink, priced), 2),
+        },
+    }
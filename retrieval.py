@@ -0,0 +1,159 @@
+import heapq
+import math
+import threading
+from collections import Counter, defaultdict
+
+from inventory import normalize_name
+
+
+def format_item(item):
+    return (
+        f"{item['name']} ({item['category']}, {item['color']}, {item['color_id']}, {item['num_holes']}): "
+        f"Clink = ${item['price_clink']}, "
+        f"Home Depot = ${item['price_home_depot']}, "
+        f"{item['available']} available"
+    )
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English text; close enough for budgeting
+    return len(text) // 4 + 1
+
+
+# Later messages say more about what the customer wants right now
+_MESSAGE_WEIGHTS = (1.0, 0.6, 0.4, 0.25, 0.15, 0.1)
+
+
+class _Index:
+    """TF-IDF postings over each row's category, color and name."""
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.items = snapshot.items
+        self.lines = [format_item(item) for item in self.items]
+        self.costs = [estimate_tokens(line) + 1 for line in self.lines]
+        self.min_cost = min(self.costs, default=1)
+        self.in_stock = [item["available"] > 0 for item in self.items]
+
+        documents = []
+        df = Counter()
+        for item in self.items:
+            # category and color are repeated so they outweigh name filler words
+            terms = Counter(normalize_name(
+                f"{item['category']} {item['category']} {item['color']} {item['color']} {item['name']}"
+            ).split())
+            documents.append(terms)
+            df.update(terms.keys())
+
+        n = len(self.items)
+        self.idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+        self.postings = defaultdict(list)
+        for row, terms in enumerate(documents):
+            norm = math.sqrt(sum((tf * self.idf[t]) ** 2 for t, tf in terms.items())) or 1.0
+            for term, tf in terms.items():
+                self.postings[term].append((row, tf * self.idf[term] / norm))
+
+        # Default ordering when nothing in the conversation matches: the
+        # best-stocked rows, taking turns across categories
+        by_category = defaultdict(list)
+        for row in sorted(range(n), key=lambda r: -self.items[r]["available"]):
+            by_category[self.items[row]["category"]].append(row)
+        self.overview = []
+        queues = list(by_category.values())
+        depth = 0
+        while queues:
+            queues = [rows for rows in queues if depth < len(rows)]
+            self.overview.extend(rows[depth] for rows in queues)
+            depth += 1
+
+        self.categories = sorted(by_category)
+
+
+class InventoryRetriever:
+    """Picks the inventory rows worth showing the model on a given turn.
+
+    Rows are scored against the recent conversation with TF-IDF over
+    category, color and name, in-stock rows get a small boost, and the
+    best ones are taken until `token_budget` is spent. The index is
+    rebuilt when the catalog reloads; until the rebuild finishes, other
+    requests keep using the previous one.
+    """
+
+    def __init__(self, catalog, token_budget=600, in_stock_boost=0.05):
+        self.catalog = catalog
+        self.token_budget = token_budget
+        self.in_stock_boost = in_stock_boost
+        self._lock = threading.Lock()
+        self._index = _Index(catalog.snapshot())
+
+    def _current_index(self):
+        snapshot = self.catalog.snapshot()
+        index = self._index
+        if index.version != snapshot.version and self._lock.acquire(blocking=False):
+            try:
+                if self._index.version != snapshot.version:
+                    self._index = _Index(snapshot)
+                index = self._index
+            finally:
+                self._lock.release()
+        return index
+
+    def _query(self, messages, index):
+        query = Counter()
+        recent = [m for m in messages if m["role"] != "system"][-len(_MESSAGE_WEIGHTS):]
+        for weight, message in zip(_MESSAGE_WEIGHTS, reversed(recent)):
+            if message["role"] == "assistant":
+                weight *= 0.5
+            for term in normalize_name(message["content"]).split():
+                if term in index.idf:
+                    query[term] += weight
+        return query
+
+    def _select_rows(self, index, messages, budget):
+        scores = defaultdict(float)
+        for term, weight in self._query(messages, index).items():
+            term_weight = weight * index.idf[term]
+            for row, value in index.postings[term]:
+                scores[row] += term_weight * value
+
+        if scores:
+            # No point ranking more rows than could ever fit in the budget
+            limit = min(len(scores), budget // index.min_cost + 1)
+            boost = self.in_stock_boost * max(scores.values())
+            ranked = heapq.nlargest(
+                limit, scores,
+                key=lambda row: scores[row] + (boost if index.in_stock[row] else 0.0),
+            )
+            seen = set(ranked)
+            ranked.extend(row for row in index.overview if row not in seen)
+        else:
+            ranked = index.overview
+
+        chosen = []
+        for row in ranked:
+            budget -= index.costs[row]
+            if budget < 0:
+                break
+            chosen.append(row)
+        return chosen
+
+    def select(self, messages, token_budget=None):
+        """Return the rows to show for this conversation, best first."""
+        index = self._current_index()
+        budget = self.token_budget if token_budget is None else token_budget
+        return [index.items[row] for row in self._select_rows(index, messages, budget)]
+
+    def inventory_section(self, messages, token_budget=None):
+        """The inventory part of the system prompt for this turn."""
+        index = self._current_index()
+        budget = self.token_budget if token_budget is None else token_budget
+        rows = self._select_rows(index, messages, budget)
+        lines = "\n".join(f"- {index.lines[row]}" for row in rows)
+        return (
+            "Clink’s Current Inventory (the items most relevant to this conversation; "
+            f"we carry {len(index.items)} items in total across these categories: "
+            f"{', '.join(index.categories)}):\n"
+            f"{lines}\n\n"
+            "Only recommend items listed here. If the customer wants something else, "
+            "ask about category and color so the matching items can be shown."
+        )
@@ -0,0 +1,72 @@
+import json
+import re
+
+# The hidden tag the model appends once material and quantity are known
+COST_TAG = re.compile(r"\[calculate_cost\(name=['\"](.+?)['\"],\s*quantity=(\d+)\)\]")
+
+_TAG_OPENER = "[calculate_cost("
+# Anything longer than this that still hasn't closed isn't a tag we'd act on
+_MAX_TAG_LENGTH = 300
+
+
+class CostTagFilter:
+    """Splits a streamed completion into plain text and cost tags.
+
+    Text is passed through as soon as it can't be the start of a
+    `[calculate_cost(...)]` tag. A possible tag is held back until it either
+    completes, in which case its regex match is returned in place of the
+    text, or turns out not to be one, in which case it is released as text.
+
+        tags = CostTagFilter()
+        for chunk in stream:
+            for part in tags.feed(chunk):
+                ...  # str, or an re.Match for a complete tag
+        for part in tags.flush():
+            ...
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text):
+        self._pending += text
+        parts = []
+        while self._pending:
+            start = self._pending.find("[")
+            if start == -1:
+                parts.append(self._pending)
+                self._pending = ""
+                break
+            if start:
+                parts.append(self._pending[:start])
+                self._pending = self._pending[start:]
+
+            match = COST_TAG.match(self._pending)
+            if match:
+                parts.append(match)
+                self._pending = self._pending[match.end():]
+            elif self._could_be_tag(self._pending):
+                break
+            else:
+                parts.append("[")
+                self._pending = self._pending[1:]
+        return [part for part in parts if part != ""]
+
+    def flush(self):
+        rest, self._pending = self._pending, ""
+        return [rest] if rest else []
+
+    @staticmethod
+    def _could_be_tag(text):
+        if len(text) <= len(_TAG_OPENER):
+            return _TAG_OPENER.startswith(text)
+        return text.startswith(_TAG_OPENER) and ")]" not in text and len(text) < _MAX_TAG_LENGTH
+
+
+def sse_event(data, event=None):
+    """Format one server-sent event with a JSON payload."""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inventory import InventoryCatalog  # noqa: E402
+
+INVENTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "inventory.csv")
+
+
+@pytest.fixture
+def make_catalog(tmp_path):
+    """Build a catalog from the repo's inventory.csv plus `extra_rows` (CSV
+    lines), or from the extra rows alone with `include_repo_rows=False`."""
+    count = [0]
+
+    def make(extra_rows="", include_repo_rows=True):
+        count[0] += 1
+        path = tmp_path / f"inventory_{count[0]}.csv"
+        with open(INVENTORY, newline="") as f:
+            base = f.read() if include_repo_rows else f.readline()
+        path.write_text(base + extra_rows)
+        return InventoryCatalog(str(path), check_interval=3600)
+
+    return make
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "inventory_rows(rows): extra CSV rows for the catalog fixture")
+
+
+@pytest.fixture
+def catalog(request, make_catalog):
+    """The repo's inventory, plus any rows given per module or test with
+    @pytest.mark.inventory_rows(rows)."""
+    marker = request.node.get_closest_marker("inventory_rows")
+    return make_catalog(marker.args[0] if marker else "")
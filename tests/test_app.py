@@ -0,0 +1,111 @@
+import os
+
+import httpx
+import openai
+import pytest
+
+from conftest import INVENTORY
+
+# Configure the app before importing it: in-memory history, and a model
+# endpoint nothing listens on so no test can reach the real API
+os.environ.update({
+    "HISTORY_BACKEND": "memory",
+    "INVENTORY_PATH": INVENTORY,
+    "OPENAI_API_KEY": "test",
+    "OPENAI_BASE_URL": "http://127.0.0.1:9/v1",
+    "LLM_MAX_RETRIES": "0",
+    "LLM_TIMEOUT": "2",
+})
+
+import Chatbot  # noqa: E402
+
+# Close to White Clay Bricks in color and size, with plenty in stock
+RECLAIMED = "Reclaimed White Bricks,brick,white,#E0DDD5,0.60,,900,9.5,2.5,2.75,0\n"
+
+
+@pytest.fixture
+def client():
+    return Chatbot.app.test_client()
+
+
+@pytest.fixture
+def app_catalog(monkeypatch, catalog):
+    monkeypatch.setattr(Chatbot, "catalog", catalog)
+    return catalog
+
+
+def test_cost_reply_prices_what_is_in_stock(app_catalog):
+    reply = Chatbot.cost_reply("white clay bricks", 80)
+    assert reply.startswith("You will need 80 White Clay Bricks for your project.")
+
+
+@pytest.mark.inventory_rows(RECLAIMED)
+def test_cost_reply_offers_a_close_alternative(app_catalog):
+    reply = Chatbot.cost_reply("White Clay Bricks", 500)
+    assert "Reclaimed White Bricks is a close match" in reply
+
+
+def test_cost_reply_does_not_call_a_distant_alternative_close(app_catalog):
+    # Only Rustic Red Clay Bricks can cover 1000, and red is nothing like white
+    reply = Chatbot.cost_reply("White Clay Bricks", 1000)
+    assert "close match" not in reply
+    assert "we do have 450 in stock" in reply
+
+
+def test_cost_reply_unknown_item(app_catalog):
+    assert Chatbot.cost_reply("Granite Slabs", 40) is None
+
+
+def test_quote(client):
+    response = client.post("/quote", json={"items": [{"name": "White Clay Bricks", "quantity": 80}]})
+    assert response.status_code == 200
+    assert response.json["lines"][0]["Status"] == "ok"
+    assert response.json["totals"]["Clink Price"] == 60.0
+
+
+@pytest.mark.parametrize("items", [
+    None,
+    [],
+    [{"name": "White Clay Bricks"}],
+    ["White Clay Bricks"],
+    [{"name": "White Clay Bricks", "quantity": 2.7}],
+    [{"name": "White Clay Bricks", "quantity": 3.0}],
+    [{"name": "White Clay Bricks", "quantity": True}],
+    [{"name": "White Clay Bricks", "quantity": "80"}],
+    [{"name": "White Clay Bricks", "quantity": None}],
+    [{"name": "White Clay Bricks", "quantity": 0}],
+    [{"name": "White Clay Bricks", "quantity": -5}],
+])
+def test_quote_rejects_bad_items(client, items):
+    response = client.post("/quote", json={"items": items})
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_quote_line_limit(client):
+    items = [{"name": "White Clay Bricks", "quantity": 1}] * (Chatbot.MAX_QUOTE_LINES + 1)
+    assert client.post("/quote", json={"items": items}).status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/chat", "/chat/stream"])
+def test_unreachable_model_is_a_json_502(client, path):
+    response = client.post(path, json={"message": "what bricks suit a garden wall?"})
+    assert response.status_code == 502
+    assert "error" in response.json
+
+
+class FailingGateway:
+    def __init__(self, status):
+        self.status = status
+
+    def complete(self, **kwargs):
+        response = httpx.Response(self.status, request=httpx.Request("POST", "http://model/v1/chat/completions"))
+        raise openai.APIStatusError("failed", response=response, body=None)
+
+
+@pytest.mark.parametrize("status, expected", [(429, 503), (500, 503), (503, 503), (400, 502), (401, 502)])
+def test_model_status_errors_are_json(client, monkeypatch, status, expected):
+    monkeypatch.setattr(Chatbot, "llm", FailingGateway(status))
+    response = client.post("/chat", json={"message": "what bricks suit a garden wall?"})
+    assert response.status_code == expected
+    assert "error" in response.json
@@ -0,0 +1,94 @@
+import pytest
+
+from compaction import HistoryCompactor
+from history_store import MemoryHistoryStore, SQLiteHistoryStore
+
+PRICED = ("You will need 80 White Clay Bricks for your project.\n"
+          "Clink charges $60.0 compared to $160.0 at Home Depot.")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryHistoryStore()
+    return SQLiteHistoryStore(str(tmp_path / "history.sqlite3"))
+
+
+def turns(*pairs):
+    history = []
+    for user, assistant in pairs:
+        history += [{"role": "user", "content": user}, {"role": "assistant", "content": assistant}]
+    return history
+
+
+def test_short_history_is_sent_as_is(store, catalog):
+    compactor = HistoryCompactor(store, catalog, keep_turns=3)
+    history = turns(("hi", "hello"), ("bricks?", "sure"))
+    assert compactor.compact("s", history) == (history, 0)
+    assert store.load_summary("s") is None
+
+
+def test_old_turns_are_folded_into_a_summary(store, catalog):
+    compactor = HistoryCompactor(store, catalog, keep_turns=1)
+    history = turns(
+        ("I'm building a garden wall", "Nice! Any color in mind?"),
+        ("white bricks, I need 80 white clay bricks", PRICED),
+        ("thanks", "Anything else?"),
+    )
+    messages, saved = compactor.compact("s", history)
+    assert saved > 0
+    assert messages[1:] == history[-2:]
+    summary = messages[0]["content"]
+    assert "Customer opened with: I'm building a garden wall" in summary
+    assert "already priced: 80 × White Clay Bricks" in summary
+    assert "Quantities mentioned: 80" in summary
+    assert "brick" in summary and "white" in summary
+
+
+def test_user_quantities_are_not_recorded_as_priced(store, catalog):
+    compactor = HistoryCompactor(store, catalog, keep_turns=1)
+    history = turns(
+        ("I need white brick for 2 walls", "How big are the walls?"),
+        ("I want 80 white clay bricks", "We're short on those, how about something else?"),
+        ("ok", "Great"),
+    )
+    summary = compactor.compact("s", history)[0][0]["content"]
+    assert store.load_summary("s")["agreed"] == []
+    assert "× White Clay Bricks" not in summary
+    assert "Quantities mentioned: 2, 80" in summary
+
+
+def test_summary_is_updated_incrementally(store, catalog):
+    compactor = HistoryCompactor(store, catalog, keep_turns=1)
+    history = turns(("I'm tiling a bathroom", "Which color?"), ("gray", "Got it"))
+    compactor.compact("s", history)
+    assert store.load_summary("s")["upto"] == 2
+
+    history += turns(("need 80 white clay bricks too", PRICED), ("thanks", "Bye"))
+    messages, _ = compactor.compact("s", history)
+    summary = store.load_summary("s")
+    assert summary["upto"] == 6
+    assert summary["project"] == "I'm tiling a bathroom"
+    assert summary["agreed"] == ["80 × White Clay Bricks"]
+    assert messages[1:] == history[-2:]
+
+
+def test_stale_summary_is_cleared_from_the_store(store, catalog):
+    compactor = HistoryCompactor(store, catalog, keep_turns=1)
+    store.save_summary("s", {"upto": 6, "project": "old project", "agreed": ["500 × Old Bricks"],
+                             "colors": [], "categories": [], "quantities": []})
+    history = turns(("hi", "hello"))
+    assert compactor.compact("s", history) == (history, 0)
+    assert store.load_summary("s") is None
+
+
+def test_unpriced_cost_tag_is_not_recorded_as_priced(store, catalog):
+    # cost_reply() leaves the tag in place when the item isn't in the inventory
+    compactor = HistoryCompactor(store, catalog, keep_turns=1)
+    history = turns(
+        ("countertop slabs please", 'Sure! [calculate_cost(name="Granite Slabs", quantity=40)]'),
+        ("ok", "Great"),
+    )
+    summary = compactor.compact("s", history)[0][0]["content"]
+    assert store.load_summary("s")["agreed"] == []
+    assert "Granite Slabs" not in summary
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+from history_store import MemoryHistoryStore, SQLiteHistoryStore
+
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "history.sqlite3")
+
+
+def test_append_and_load(path):
+    store = SQLiteHistoryStore(path)
+    store.append("s", [message("user", "hi"), message("assistant", "hello")])
+    store.append("s", [message("user", "bricks?")])
+    assert [m["content"] for m in store.load("s")] == ["hi", "hello", "bricks?"]
+    assert store.load("other") == []
+
+
+def test_expired_session_is_not_revived_by_append(path, clock):
+    store = SQLiteHistoryStore(path, ttl=60)
+    store.append("s", [message("user", "old1"), message("assistant", "old2")])
+    store.save_summary("s", {"upto": 2})
+
+    clock[0] += 61
+    assert store.load("s") == []
+
+    store.append("s", [message("user", "new")])
+    assert [m["content"] for m in store.load("s")] == ["new"]
+    assert store.load_summary("s") is None
+
+
+def test_expired_session_is_not_revived_through_another_store(path, clock):
+    first = SQLiteHistoryStore(path, ttl=60)
+    first.append("s", [message("user", "old")])
+    assert len(first.load("s")) == 1
+
+    clock[0] += 61
+    SQLiteHistoryStore(path, ttl=60).append("s", [message("user", "new")])
+    assert [m["content"] for m in first.load("s")] == ["new"]
+
+
+def test_purge_expired(path, clock):
+    store = SQLiteHistoryStore(path, ttl=60)
+    store.append("old", [message("user", "a")])
+    store.save_summary("old", {"upto": 1})
+    clock[0] += 61
+    store.append("fresh", [message("user", "b")])
+    store.purge_expired()
+
+    conn = store._connect()
+    assert conn.execute("SELECT DISTINCT session_id FROM messages").fetchall() == [("fresh",)]
+    assert conn.execute("SELECT COUNT(*) FROM summaries").fetchone() == (0,)
+
+
+def test_load_fetches_rows_written_by_another_store(path):
+    # Two stores on one file stand in for two worker processes
+    first, second = SQLiteHistoryStore(path), SQLiteHistoryStore(path)
+    first.append("s", [message("user", "one")])
+    assert [m["content"] for m in first.load("s")] == ["one"]
+
+    second.append("s", [message("assistant", "two")])
+    assert [m["content"] for m in first.load("s")] == ["one", "two"]
+
+
+def test_append_over_stale_cache_keeps_order(path):
+    first, second = SQLiteHistoryStore(path), SQLiteHistoryStore(path)
+    first.append("s", [message("user", "one")])
+    first.load("s")
+    second.append("s", [message("assistant", "two")])
+    # first's cached copy is behind, so this write must not just be tacked onto it
+    first.append("s", [message("user", "three")])
+    assert [m["content"] for m in first.load("s")] == ["one", "two", "three"]
+
+
+def test_cache_dropped_when_session_cleared_elsewhere(path):
+    first, second = SQLiteHistoryStore(path), SQLiteHistoryStore(path)
+    first.append("s", [message("user", "old")])
+    first.load("s")
+
+    second.clear("s")
+    assert first.load("s") == []
+    second.append("s", [message("user", "new")])
+    assert [m["content"] for m in first.load("s")] == ["new"]
+
+
+def test_load_returns_a_copy(path):
+    store = SQLiteHistoryStore(path)
+    store.append("s", [message("user", "one")])
+    store.load("s").append(message("user", "not saved"))
+    assert len(store.load("s")) == 1
+
+
+def test_memory_store_drops_summary_of_expired_session():
+    store = MemoryHistoryStore(ttl=0.05)
+    store.append("s", [message("user", "old")])
+    store.save_summary("s", {"upto": 1})
+    time.sleep(0.1)
+
+    assert store.load("s") == []
+    # A summary that outlived its session, e.g. one saved late in a turn
+    store.save_summary("s", {"upto": 1})
+    store.append("s", [message("user", "new")])
+    assert [m["content"] for m in store.load("s")] == ["new"]
+    assert store.load_summary("s") is None
+
+
+def test_clear(path):
+    for store in (MemoryHistoryStore(), SQLiteHistoryStore(path)):
+        store.append("s", [message("user", "one")])
+        store.save_summary("s", {"upto": 1})
+        store.clear("s")
+        assert store.load("s") == []
+        assert store.load_summary("s") is None
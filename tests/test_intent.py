@@ -0,0 +1,74 @@
+import pytest
+
+from intent import find_mentions, parse_order, parse_quantity
+
+EXTRA_ROWS = "Gray Slate Tiles,tile,gray,#8C8C8C,2.10,4.50,600,12,12,0.375,0\n"
+pytestmark = pytest.mark.inventory_rows(EXTRA_ROWS)
+
+
+def order(message, catalog):
+    result = parse_order(message, catalog)
+    return (result[0]["name"], result[1]) if result else None
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("I want 80 white clay bricks", ("White Clay Bricks", 80)),
+    ("80 White Clay Bricks please", ("White Clay Bricks", 80)),
+    ("Let's go with 1,200 rustic red clay bricks.", ("Rustic Red Clay Bricks", 1200)),
+    ("I'll take 30 gray tiles", ("Gray Slate Tiles", 30)),
+    ("give me 12 white bricks", ("White Clay Bricks", 12)),
+    ("can I get 40 tiles", ("Gray Slate Tiles", 40)),
+])
+def test_explicit_orders(message, expected, catalog):
+    assert order(message, catalog) == expected
+
+
+@pytest.mark.parametrize("message", [
+    # the number isn't next to the item
+    "I need white brick for 2 walls",
+    "Is white brick ok for a 3 step stair?",
+    "white clay bricks, maybe 80",
+    # negated
+    "I do not want 80 white clay bricks",
+    "I don't want 80 white clay bricks",
+    "never mind the 80 white clay bricks",
+    # money
+    "my budget is 200 for white bricks",
+    "I can spend 200 white clay bricks worth",
+    "I have $200 for white clay bricks",
+    "200 dollars of white clay bricks",
+    # ambiguous or not an item
+    "I want 80 red bricks",
+    "I want 80 bricks",
+    "I want 80 purple bricks",
+    "80 white tiles",
+    # no single plain quantity
+    "I want 80 or 90 white clay bricks",
+    "a 6ft wall of white clay bricks",
+    "white clay bricks please",
+])
+def test_not_orders(message, catalog):
+    assert order(message, catalog) is None
+
+
+def test_parse_quantity():
+    assert parse_quantity("about 1,200 of them") == 1200
+    assert parse_quantity("80") == 80
+    assert parse_quantity("0 bricks") is None
+    assert parse_quantity("a wall 8 ft long") is None
+    assert parse_quantity("3x5 pavers") is None
+    assert parse_quantity("80 or 90") is None
+
+
+def test_find_mentions(catalog):
+    categories, colors = find_mentions("Red or gray? Tiles and bricks", catalog)
+    assert sorted(categories) == ["brick", "tile"]
+    assert sorted(colors) == ["gray", "red"]
+
+
+def test_vocabulary_follows_the_catalog(make_catalog, catalog):
+    other = make_catalog(EXTRA_ROWS.replace("Gray Slate", "Blue Slate").replace("gray,#8C8C8C", "blue,#4A6A8A"),
+                         include_repo_rows=False)
+    assert order("20 gray slate tiles", catalog) == ("Gray Slate Tiles", 20)
+    assert order("20 blue slate tiles", other) == ("Blue Slate Tiles", 20)
+    assert order("20 gray slate tiles", other) is None
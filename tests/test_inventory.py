@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from inventory import InventoryCatalog, normalize_key, normalize_name
+
+HEADER = "name,category,color,color_id,price_clink,price_home_depot,available,length_in,width_in,height_in,num_holes\n"
+ROWS = (
+    "White Clay Bricks,brick,white,#E8E4DA,0.75,2.00,450,9.5,2.5,2.75,4\n"
+    "Rustic Red Clay Bricks,brick,red,#B64528,0.55,1.30,1000,9.5,2.5,2.75,4\n"
+    "Gray Slate Tiles,tile,gray,#8C8C8C,2.10,,600,12,12,0.375,0\n"
+)
+NEW_ROW = "Tan Pavers,paver,tan,#C8A97E,0.90,1.80,300,8,4,2.375,0\n"
+
+
+def write(path, text):
+    # Bump the mtime explicitly so a rewrite within one clock tick is still seen
+    stamp = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    path.write_text(text)
+    os.utime(path, ns=(stamp + 10**9, stamp + 10**9))
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "inventory.csv"
+    write(path, HEADER + ROWS)
+    return path
+
+
+@pytest.fixture
+def catalog(path):
+    # check_interval=0 so every lookup checks the file
+    return InventoryCatalog(str(path), check_interval=0)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("White Clay Bricks", "white clay brick"),
+    ("white-clay brick.", "white clay brick"),
+    ("  WHITE   CLAY BRICKS!! ", "white clay brick"),
+    ("Cherries", "cherry"),
+    ("Glass", "glass"),
+    ("bus", "bus"),
+    ("#B65A43 tiles", "#b65a43 tile"),
+])
+def test_normalize_name(name, expected):
+    assert normalize_name(name) == expected
+
+
+def test_normalize_key():
+    assert normalize_key(" Brick ") == "brick"
+    assert normalize_key(4) == "4"
+
+
+def test_rows_are_parsed(catalog):
+    item = catalog.find("White Clay Bricks")
+    assert item["price_clink"] == 0.75
+    assert item["available"] == 450
+    assert item["height_in"] == 2.75
+    assert catalog.find("gray slate tiles")["price_home_depot"] is None
+
+
+def test_lookups(catalog):
+    assert len(catalog) == 3
+    assert catalog.find("white clay brick")["name"] == "White Clay Bricks"
+    assert catalog.find("Purple Bricks") is None
+    assert catalog.find("") is None
+    assert [i["name"] for i in catalog.filter(category="Brick")] == ["White Clay Bricks", "Rustic Red Clay Bricks"]
+    assert [i["name"] for i in catalog.filter(category="brick", color="red")] == ["Rustic Red Clay Bricks"]
+    assert [i["name"] for i in catalog.filter(num_holes=0)] == ["Gray Slate Tiles"]
+    assert catalog.filter(category="brick", color="gray") == []
+    assert len(catalog.filter()) == 3
+
+
+def test_reload_on_change(path, catalog):
+    old = catalog.snapshot()
+    assert catalog.snapshot() is old
+
+    write(path, HEADER + ROWS + NEW_ROW)
+    assert catalog.find("Tan Pavers")["available"] == 300
+    assert catalog.version == old.version + 1
+    # Readers holding the old snapshot keep a consistent view
+    assert "tan paver" not in old.by_name
+
+
+def test_check_interval_limits_stat_calls(path):
+    catalog = InventoryCatalog(str(path), check_interval=3600)
+    write(path, HEADER + ROWS + NEW_ROW)
+    assert catalog.find("Tan Pavers") is None
+    assert catalog.reload(force=True)
+    assert catalog.find("Tan Pavers") is not None
+
+
+@pytest.mark.parametrize("text", [
+    "",  # truncated, e.g. just opened for writing
+    HEADER,
+    HEADER + ROWS + "Tan Pavers,paver,tan,#C8A97E,0.90",  # cut off mid-row
+    HEADER + ROWS + "Tan Pavers,paver,tan,#C8A97E,0.90,1.80,300,8,4",  # cut off in blank-able fields
+    HEADER + ROWS + "Tan Pavers,paver,tan,#C8A97E,cheap,1.80,300,8,4,2.375,0\n",  # bad number
+    HEADER + ROWS + NEW_ROW.replace(",0\n", ",0,extra\n"),
+    "nonsense\n1\n",  # missing columns
+], ids=["empty", "header-only", "cut-mid-row", "cut-in-optional-fields", "bad-number", "extra-field",
+        "missing-columns"])
+def test_failed_reload_keeps_previous_snapshot(path, catalog, text):
+    old = catalog.snapshot()
+    write(path, text)
+    assert catalog.reload() is False
+    assert catalog.snapshot() is old
+    assert catalog.find("White Clay Bricks") is not None
+
+
+def test_failed_file_is_not_reparsed_until_it_changes(path, catalog, caplog):
+    write(path, HEADER + ROWS + "Tan Pavers,paver")
+    assert catalog.reload() is False
+    assert catalog.reload() is False
+    assert len([r for r in caplog.records if "reload" in r.getMessage()]) == 1
+
+    write(path, HEADER + ROWS + NEW_ROW)
+    assert catalog.reload() is True
+    assert catalog.find("Tan Pavers") is not None
+
+
+def test_missing_file_keeps_previous_snapshot(path, catalog):
+    old = catalog.snapshot()
+    os.remove(path)
+    assert catalog.reload() is False
+    assert catalog.snapshot() is old
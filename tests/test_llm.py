@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import openai
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench"))
+
+from fake_openai import Script, make_handler  # noqa: E402
+from llm import LLMGateway, LLMTimeout, Overloaded  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def fake_api():
+    servers = []
+
+    def start(**script):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(Script(**script)))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def gateway(base_url, **kwargs):
+    return LLMGateway(api_key="test", base_url=base_url, backoff_base=0.01, **kwargs)
+
+
+def test_complete(fake_api):
+    llm = gateway(fake_api(latency=0, replies=["Hello there"]))
+    assert llm.complete(model="m", messages=MESSAGES).choices[0].message.content == "Hello there"
+
+
+def test_sheds_load_when_every_slot_is_busy(fake_api):
+    llm = gateway(fake_api(latency=0, replies=["one two three"]), max_concurrency=1)
+    stream = llm.stream(model="m", messages=MESSAGES)
+    with pytest.raises(Overloaded):
+        llm.complete(model="m", messages=MESSAGES)
+    assert "".join(c.choices[0].delta.content or "" for c in stream if c.choices) == "one two three"
+    # Finishing the stream gives its slot back
+    assert llm.complete(model="m", messages=MESSAGES)
+
+
+def test_closing_a_stream_early_releases_its_slot(fake_api):
+    llm = gateway(fake_api(latency=0, tokens_per_sec=20, reply_tokens=8), max_concurrency=1)
+    stream = llm.stream(model="m", messages=MESSAGES)
+    next(stream)
+    stream.close()
+    stream.close()
+    assert llm.complete(model="m", messages=MESSAGES)
+
+
+def test_gives_up_after_retries(fake_api):
+    llm = gateway(fake_api(latency=0, error_rate=1.0), max_retries=1)
+    with pytest.raises(openai.InternalServerError):
+        llm.complete(model="m", messages=MESSAGES)
+    # The slot is released after a failure too
+    assert llm._slots.acquire(blocking=False)
+
+
+def test_deadline(fake_api):
+    llm = gateway(fake_api(latency=1.0), timeout=0.2)
+    with pytest.raises(LLMTimeout):
+        llm.complete(model="m", messages=MESSAGES)
@@ -0,0 +1,127 @@
+import io
+import json
+import logging
+
+import pytest
+from werkzeug.test import Client
+
+import metrics
+from metrics import Registry
+
+
+@pytest.fixture
+def registry():
+    return Registry(enabled=True)
+
+
+@pytest.fixture
+def tracked(monkeypatch):
+    """Turn the module's registry and request log on for one test."""
+    monkeypatch.setattr(metrics.registry, "enabled", True)
+    stream = io.StringIO()
+    metrics.enable_request_log(stream)
+    yield stream
+    metrics.request_log = False
+    metrics.request_logger.removeHandler(metrics._request_handler)
+    metrics._request_handler = None
+
+
+def test_counter(registry):
+    counter = registry.counter("jobs_total", "Jobs run", ["kind"])
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    counter.inc(kind="b")
+    assert registry.render() == (
+        "# HELP jobs_total Jobs run\n"
+        "# TYPE jobs_total counter\n"
+        'jobs_total{kind="a"} 3.0\n'
+        'jobs_total{kind="b"} 1.0\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = registry.histogram("wait_seconds", "Wait", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0, 3.0):
+        histogram.observe(value)
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'wait_seconds_bucket{le="0.1"} 2',
+        'wait_seconds_bucket{le="1.0"} 3',
+        'wait_seconds_bucket{le="+Inf"} 5',
+        "wait_seconds_sum 5.65",
+        "wait_seconds_count 5",
+    ]
+
+
+def test_histogram_with_labels(registry):
+    histogram = registry.histogram("phase_seconds", "Phases", ["phase"], buckets=(1.0,))
+    histogram.observe(0.5, phase="b")
+    histogram.observe(5.0, phase="a")
+    lines = registry.render().splitlines()
+    assert 'phase_seconds_bucket{phase="a",le="1.0"} 0' in lines
+    assert 'phase_seconds_bucket{phase="a",le="+Inf"} 1' in lines
+    assert 'phase_seconds_count{phase="b"} 1' in lines
+    # label sets render in a stable order
+    assert lines.index('phase_seconds_count{phase="a"} 1') < lines.index('phase_seconds_count{phase="b"} 1')
+
+
+def test_label_values_are_escaped(registry):
+    counter = registry.counter("errors_total", "Errors", ["type"])
+    counter.inc(type='say "hi"\\\nbye')
+    assert 'errors_total{type="say \\"hi\\"\\\\\\nbye"} 1.0' in registry.render().splitlines()
+
+
+def test_readings(registry):
+    registry.reading("cache_entries", "Entries", lambda: 7)
+    registry.reading("cache_hits_total", "Hits", lambda: 3, type="counter")
+    lines = registry.render().splitlines()
+    assert lines == [
+        "# HELP cache_entries Entries", "# TYPE cache_entries gauge", "cache_entries 7",
+        "# HELP cache_hits_total Hits", "# TYPE cache_hits_total counter", "cache_hits_total 3",
+    ]
+
+
+def test_disabled_registry_ignores_updates():
+    registry = Registry(enabled=False)
+    counter = registry.counter("jobs_total", "Jobs")
+    histogram = registry.histogram("wait_seconds", "Wait", buckets=(1.0,))
+    counter.inc()
+    histogram.observe(0.5)
+    assert registry.render() == (
+        "# HELP jobs_total Jobs\n# TYPE jobs_total counter\n"
+        "# HELP wait_seconds Wait\n# TYPE wait_seconds histogram\n"
+    )
+
+
+def test_helpers_are_no_ops_while_not_tracking(monkeypatch):
+    monkeypatch.setattr(metrics.registry, "enabled", False)
+    monkeypatch.setattr(metrics, "request_log", False)
+    assert metrics.span("x") is metrics._NULL_SPAN
+    metrics.event("tag_hit")
+    metrics.add_phase("x", 1.0)
+    assert metrics.current_request() is None
+
+
+def app(environ, start_response):
+    with metrics.span("work"):
+        metrics.event("tag_hit")
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"ok"]
+
+
+def test_middleware_logs_one_line_per_request(tracked):
+    response = Client(metrics.MetricsMiddleware(app)).get("/", buffered=True)
+    assert response.status_code == 200
+    record = json.loads(tracked.getvalue())
+    assert record["status"] == "200"
+    assert record["events"] == ["tag_hit"]
+    assert "work" in record["phases_ms"]
+    assert metrics.current_request() is None
+
+
+def test_request_log_has_its_own_handler(tracked):
+    assert metrics.request_logger.level == logging.INFO
+    assert metrics.request_logger.propagate is False
+    handler = metrics._request_handler
+    metrics.enable_request_log()
+    assert metrics.request_logger.handlers.count(handler) == 1
@@ -0,0 +1,86 @@
+import pytest
+
+from quote import quote_lines, recommended_quantity
+
+# A row with no Home Depot price
+EXTRA_ROWS = "Reclaimed White Bricks,brick,white,#E0DDD5,0.60,,900,9.5,2.5,2.75,0\n"
+pytestmark = pytest.mark.inventory_rows(EXTRA_ROWS)
+
+
+def test_recommended_quantity():
+    assert recommended_quantity(80) == 90
+    assert recommended_quantity(100) == 110
+    assert recommended_quantity(1) == 5
+
+
+def test_single_line(catalog):
+    quote = quote_lines([{"name": "white clay bricks", "quantity": 80}], catalog)
+    line = quote["lines"][0]
+    assert line["Status"] == "ok"
+    assert line["Material Name"] == "White Clay Bricks"
+    assert (line["Clink Price"], line["Retail Price"], line["Savings"]) == (60.0, 160.0, 100.0)
+    assert line["Recommended Quantity"] == 90
+    assert quote["totals"]["Clink Price"] == 60.0
+
+
+def test_lines_for_the_same_item_share_its_stock(catalog):
+    # 450 White Clay Bricks in stock
+    quote = quote_lines([{"name": "White Clay Bricks", "quantity": 300}] * 2, catalog)
+    first, second = quote["lines"]
+    assert first["Status"] == "ok"
+    assert second["Status"] == "insufficient_stock"
+    assert second["Available"] == 150
+    assert quote["totals"]["Fillable Lines"] == 1
+    assert quote["totals"]["Clink Price"] == 225.0
+
+    quote = quote_lines([{"name": "White Clay Bricks", "quantity": 200}] * 2, catalog)
+    assert [line["Status"] for line in quote["lines"]] == ["ok", "ok"]
+
+
+def test_short_and_unknown_lines(catalog):
+    quote = quote_lines([
+        {"name": "Earthy Brown Bricks", "quantity": 10},
+        {"name": "Unobtainium Bricks", "quantity": 10},
+    ], catalog)
+    short, missing = quote["lines"]
+    assert short["Status"] == "insufficient_stock"
+    assert short["Alternatives"]
+    assert all(alt["Available"] >= 10 for alt in short["Alternatives"])
+    assert missing["Status"] == "not_found"
+    assert quote["totals"]["Fillable Lines"] == 0
+
+
+def test_retail_totals_only_cover_lines_with_a_retail_price(catalog):
+    quote = quote_lines([
+        {"name": "White Clay Bricks", "quantity": 80},
+        {"name": "Reclaimed White Bricks", "quantity": 100},
+    ], catalog)
+    assert quote["lines"][1]["Retail Price"] == "N/A"
+    totals = quote["totals"]
+    assert totals["Clink Price"] == 120.0
+    assert totals["Retail Priced Lines"] == 1
+    assert totals["Retail Price Partial"] is True
+    assert totals["Retail Price"] == 160.0
+    assert totals["Savings"] == 100.0
+
+    totals = quote_lines([{"name": "White Clay Bricks", "quantity": 80}], catalog)["totals"]
+    assert totals["Retail Price Partial"] is False
+
+
+def test_alternatives_skip_stock_the_quote_already_uses(catalog):
+    # 1000 Rustic Red Clay Bricks in stock; line 1 takes them all
+    quote = quote_lines([
+        {"name": "Rustic Red Clay Bricks", "quantity": 1000},
+        {"name": "White Clay Bricks", "quantity": 500},
+    ], catalog)
+    assert quote["lines"][0]["Status"] == "ok"
+    offered = {alt["Material Name"]: alt["Available"] for alt in quote["lines"][1]["Alternatives"]}
+    assert "Rustic Red Clay Bricks" not in offered
+    assert offered == {"Reclaimed White Bricks": 900}
+
+    quote = quote_lines([
+        {"name": "Rustic Red Clay Bricks", "quantity": 400},
+        {"name": "White Clay Bricks", "quantity": 500},
+    ], catalog)
+    offered = {alt["Material Name"]: alt["Available"] for alt in quote["lines"][1]["Alternatives"]}
+    assert offered["Rustic Red Clay Bricks"] == 600
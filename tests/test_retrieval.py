@@ -0,0 +1,82 @@
+import pytest
+
+from retrieval import InventoryRetriever, estimate_tokens, format_item
+
+EXTRA_ROWS = (
+    "Gray Porcelain Tiles,tile,gray,#8A8A8A,1.20,2.50,300,12,12,0.4,0\n"
+    "Blue Glass Tiles,tile,blue,#3A6EA5,2.10,4.00,0,4,4,0.3,0\n"
+    "Gray Concrete Pavers,paver,gray,#7D7D7D,0.90,1.80,800,8,4,2.4,0\n"
+)
+pytestmark = pytest.mark.inventory_rows(EXTRA_ROWS)
+
+EVERYTHING = 10_000
+
+
+def user(content):
+    return {"role": "user", "content": content}
+
+
+def names(rows):
+    return [row["name"] for row in rows]
+
+
+def test_matching_rows_come_first(catalog):
+    retriever = InventoryRetriever(catalog)
+    rows = names(retriever.select([user("I need red bricks for a garden wall")], EVERYTHING))
+    assert set(rows[:2]) == {"Rustic Red Clay Bricks", "Mixed Rustic Red Bricks"}
+    # The rest of the inventory follows, once each
+    assert sorted(rows) == sorted(item["name"] for item in catalog.items)
+
+
+def test_latest_message_outweighs_earlier_ones(catalog):
+    retriever = InventoryRetriever(catalog)
+    messages = [user("red bricks please"), {"role": "assistant", "content": "Sure, for what?"},
+                user("actually gray tiles")]
+    assert names(retriever.select(messages, EVERYTHING))[0] == "Gray Porcelain Tiles"
+
+
+def test_selection_stops_at_the_token_budget(catalog):
+    retriever = InventoryRetriever(catalog)
+    messages = [user("gray tiles")]
+    full = retriever.select(messages, EVERYTHING)
+
+    budget = sum(estimate_tokens(format_item(row)) + 1 for row in full[:3])
+    assert retriever.select(messages, budget) == full[:3]
+    assert retriever.select(messages, budget - 1) == full[:2]
+    assert retriever.select(messages, 0) == []
+
+
+def test_no_match_falls_back_to_the_overview(catalog):
+    retriever = InventoryRetriever(catalog)
+    # System messages aren't part of the query
+    messages = [{"role": "system", "content": "red bricks"}, user("hello there")]
+    # Best-stocked first, taking turns across brick, paver and tile
+    assert names(retriever.select(messages, EVERYTHING)) == [
+        "Rustic Red Clay Bricks", "Gray Concrete Pavers", "Gray Porcelain Tiles",
+        "White Clay Bricks", "Blue Glass Tiles",
+        "Mixed Rustic Red Bricks",
+        "Earthy Brown Bricks",
+    ]
+
+
+def test_index_is_rebuilt_when_the_catalog_reloads(make_catalog):
+    catalog = make_catalog(EXTRA_ROWS)
+    retriever = InventoryRetriever(catalog)
+    messages = [user("green tiles")]
+    assert "Green Glass Tiles" not in names(retriever.select(messages, EVERYTHING))
+
+    with open(catalog.path, "a") as f:
+        f.write("Green Glass Tiles,tile,green,#4F7942,2.10,4.00,60,4,4,0.3,0\n")
+    assert catalog.reload(force=True)
+    assert names(retriever.select(messages, EVERYTHING))[0] == "Green Glass Tiles"
+    assert "Green Glass Tiles" in retriever.inventory_section(messages)
+
+
+def test_inventory_section(catalog):
+    retriever = InventoryRetriever(catalog)
+    messages = [user("white bricks")]
+    section = retriever.inventory_section(messages, EVERYTHING)
+    assert "we carry 7 items in total across these categories: brick, paver, tile" in section
+    lines = [line for line in section.splitlines() if line.startswith("- ")]
+    assert lines == [f"- {format_item(row)}" for row in retriever.select(messages, EVERYTHING)]
+    assert lines[0].startswith("- White Clay Bricks (brick, white, #E8E4DA, 4)")
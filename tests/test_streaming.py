@@ -0,0 +1,88 @@
+import json
+
+from streaming import CostTagFilter, sse_event
+
+TAG = '[calculate_cost(name="White Clay Bricks", quantity=80)]'
+
+
+def run(chunks):
+    """Feed `chunks` through a filter; tags come back as (name, quantity)."""
+    tags = CostTagFilter()
+    parts = []
+    for chunk in chunks:
+        parts.extend(tags.feed(chunk))
+    parts.extend(tags.flush())
+    return [part if isinstance(part, str) else (part.group(1), int(part.group(2))) for part in parts]
+
+
+def merged(parts):
+    """Join neighbouring text parts, which the filter may split arbitrarily."""
+    out = []
+    for part in parts:
+        if isinstance(part, str) and out and isinstance(out[-1], str):
+            out[-1] += part
+        else:
+            out.append(part)
+    return out
+
+
+def test_plain_text_passes_straight_through():
+    tags = CostTagFilter()
+    assert tags.feed("Sounds good, ") == ["Sounds good, "]
+    assert tags.feed("let's do it.") == ["let's do it."]
+    assert tags.flush() == []
+
+
+def test_tag_in_one_chunk():
+    assert merged(run([f"Great! {TAG}"])) == ["Great! ", ("White Clay Bricks", 80)]
+
+
+def test_tag_split_across_chunks_at_every_position():
+    text = f"Great! {TAG} Anything else?"
+    for cut in range(1, len(text)):
+        assert merged(run([text[:cut], text[cut:]])) == [
+            "Great! ", ("White Clay Bricks", 80), " Anything else?"
+        ], cut
+
+
+def test_tag_streamed_one_character_at_a_time():
+    assert merged(run(list(f"ok {TAG}"))) == ["ok ", ("White Clay Bricks", 80)]
+
+
+def test_partial_tag_is_held_back():
+    tags = CostTagFilter()
+    assert tags.feed("Great! [calculate_co") == ["Great! "]
+    assert [m.group(1) for m in tags.feed('st(name="Red", quantity=5)]')] == ["Red"]
+
+
+def test_bracket_that_is_not_a_tag_is_released():
+    assert merged(run(["Use [mortar] ", "and [", "calc notes]"])) == ["Use [mortar] and [calc notes]"]
+    tags = CostTagFilter()
+    assert "".join(tags.feed("[see below]")) == "[see below]"
+
+
+def test_unterminated_tag_is_released_at_flush():
+    tags = CostTagFilter()
+    assert tags.feed('Done [calculate_cost(name="Red"') == ["Done "]
+    assert tags.flush() == ['[calculate_cost(name="Red"']
+
+
+def test_overlong_unclosed_tag_is_released():
+    text = '[calculate_cost(name="' + "x" * 400
+    assert "".join(CostTagFilter().feed(text)) == text
+
+
+def test_several_tags_in_one_reply():
+    other = "[calculate_cost(name='Red Pavers', quantity=12)]"
+    text = f"First {TAG} then {other}."
+    assert merged(run([text[:20], text[20:60], text[60:]])) == [
+        "First ", ("White Clay Bricks", 80), " then ", ("Red Pavers", 12), "."
+    ]
+    assert merged(run([TAG + TAG])) == [("White Clay Bricks", 80), ("White Clay Bricks", 80)]
+
+
+def test_sse_event():
+    assert sse_event({"delta": "hi"}) == 'data: {"delta": "hi"}\n\n'
+    frame = sse_event({}, event="done")
+    assert frame.startswith("event: done\n")
+    assert json.loads(frame.split("data: ", 1)[1]) == {}